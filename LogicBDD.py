@@ -0,0 +1,276 @@
+#
+# Binary decision diagrams for Logic Lights
+#
+
+# Building a diagram stops with a BDDLimit once it holds this many nodes.
+NODE_LIMIT = 2 ** 20
+
+class BDDLimit(Exception):
+    """ Raised when a diagram grows past its node limit. """
+    
+    pass
+
+class BDD:
+    """ A manager for reduced ordered binary decision diagrams.  Every
+        diagram node is an integer index into the manager's node list; 0
+        and 1 are the constants False and True.  The unique table makes
+        sure that each (level, low, high) triple is only built once, so two
+        expressions over the same variable order are equivalent exactly
+        when their diagrams have the same root.
+    """
+    
+    def __init__(self,variables,limit = NODE_LIMIT):
+        """ Creates the manager.  The variables are tested in the order
+            given, first variable at the top of every diagram.
+        """
+        
+        self.order = list(variables)
+        
+        self.levels = {}
+        for level in range(len(self.order)):
+            self.levels[self.order[level]] = level
+        
+        bottom = len(self.order)
+        
+        self.nodes = [ ( bottom , 0 , 0 ) , ( bottom , 1 , 1 ) ]
+        
+        self.unique = {}
+        self.computed = {}
+        
+        self.limit = limit
+    
+    def get_size(self):
+        """ Returns the number of nodes in the manager. """
+        
+        return len(self.nodes)
+    
+    def get_level(self,f):
+        """ Returns the level of the variable tested at node f. """
+        
+        return self.nodes[f][0]
+    
+    def node(self,level,low,high):
+        """ Returns the node testing the variable at level, going to low
+            when it is False and high when it is True.  Redundant tests are
+            removed and duplicate nodes are shared.
+        """
+        
+        if low == high:
+            return low
+        
+        key = ( level , low , high )
+        
+        if key not in self.unique:
+            
+            if len(self.nodes) >= self.limit:
+                raise BDDLimit("Diagram has more than " + str(self.limit) +
+                               " nodes.")
+            
+            self.unique[key] = len(self.nodes)
+            self.nodes.append(key)
+        
+        return self.unique[key]
+    
+    def variable(self,variable):
+        """ Returns the diagram of a single variable. """
+        
+        return self.node(self.levels[variable],0,1)
+    
+    def constant(self,value):
+        """ Returns the diagram of a constant. """
+        
+        if value:
+            return 1
+        
+        return 0
+    
+    def cofactors(self,f,level):
+        """ Returns the low and high cofactors of f with respect to the
+            variable at level.
+        """
+        
+        top , low , high = self.nodes[f]
+        
+        if top == level:
+            return low , high
+        
+        return f , f
+    
+    def negate(self,f):
+        """ Returns the diagram of the negation of f. """
+        
+        if f < 2:
+            return 1 - f
+        
+        key = ( "Not" , f )
+        
+        if key not in self.computed:
+            
+            level , low , high = self.nodes[f]
+            
+            result = self.node(level,self.negate(low),self.negate(high))
+            
+            self.computed[key] = result
+        
+        return self.computed[key]
+    
+    def apply(self,operation,f,g):
+        """ Returns the diagram of f And g or f Or g, operation being the
+            name of the node type.
+        """
+        
+        if operation == "And":
+            if f == 0 or g == 0:
+                return 0
+            if f == 1:
+                return g
+            if g == 1 or f == g:
+                return f
+        else:
+            if f == 1 or g == 1:
+                return 1
+            if f == 0:
+                return g
+            if g == 0 or f == g:
+                return f
+        
+        if g < f:
+            f , g = g , f
+        
+        key = ( operation , f , g )
+        
+        if key not in self.computed:
+            
+            level = min(self.get_level(f),self.get_level(g))
+            
+            f_low , f_high = self.cofactors(f,level)
+            g_low , g_high = self.cofactors(g,level)
+            
+            low = self.apply(operation,f_low,g_low)
+            high = self.apply(operation,f_high,g_high)
+            
+            self.computed[key] = self.node(level,low,high)
+        
+        return self.computed[key]
+    
+    def build(self,node,memo = None):
+        """ Returns the diagram of an expression tree whose leaves are the
+            manager's variables or constant Values.  Shared nodes of the
+            tree are only built once.  The tree is walked with an explicit
+            stack, inputs before the nodes using them, so its depth isn't
+            limited by recursion.
+        """
+        
+        if memo == None:
+            memo = {}
+        
+        stack = [ ( node , False ) ]
+        
+        while stack:
+            
+            current , expanded = stack.pop()
+            
+            if id(current) in memo:
+                continue
+            
+            inputs = current.get_inputs()
+            
+            if inputs != None and not expanded:
+                
+                stack.append( ( current , True ) )
+                
+                for input in reversed(inputs):
+                    if id(input) not in memo:
+                        stack.append( ( input , False ) )
+                
+                continue
+            
+            if inputs == None and current.get_type() == "Value":
+                
+                result = self.constant(current.get_value())
+            
+            elif inputs == None:
+                
+                result = self.variable(current)
+            
+            elif current.get_type() == "Not":
+                
+                result = self.negate(memo[id(inputs[0])])
+            
+            else:
+                
+                f = memo[id(inputs[0])]
+                g = memo[id(inputs[1])]
+                
+                result = self.apply(current.get_type(),f,g)
+            
+            memo[id(current)] = result
+        
+        return memo[id(node)]
+    
+    def satisfy(self,f):
+        """ Returns a dictionary from variables to truth values that makes f
+            True, or None if f is never True.  Variables that do not matter
+            are left out.
+        """
+        
+        if f == 0:
+            return None
+        
+        assignment = {}
+        
+        while f > 1:
+            
+            level , low , high = self.nodes[f]
+            
+            if low != 0:
+                assignment[self.order[level]] = False
+                f = low
+            else:
+                assignment[self.order[level]] = True
+                f = high
+        
+        return assignment
+
+
+def order_variables(statements,variables):
+    """ Orders the variables for a diagram by the order they are first met
+        in a depth-first walk of the statements, which keeps variables that
+        are used together close together.  Variables that never appear are
+        put last.
+    """
+    
+    members = set(variables)
+    
+    order = []
+    found = set()
+    visited = set()
+    
+    stack = list(reversed(statements))
+    
+    while stack:
+        
+        node = stack.pop()
+        
+        if id(node) in visited:
+            continue
+        
+        visited.add(id(node))
+        
+        inputs = node.get_inputs()
+        
+        if inputs == None:
+            
+            if node in members and node not in found:
+                found.add(node)
+                order.append(node)
+        
+        else:
+            
+            stack.extend(reversed(inputs))
+    
+    for variable in variables:
+        if variable not in found:
+            order.append(variable)
+    
+    return order
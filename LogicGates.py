@@ -1,4 +1,5 @@
 import pygame as pg
+from array import array
 from LogicLogic import *
 from LogicScreen import *
 
@@ -34,6 +35,27 @@ LETTER_OFF = BLACK
 ## LETTER_ON = BLACK
 ## LETTER_OFF = WHITE
 
+#
+# WIRING TOPOLOGY
+#
+
+# The version of the wiring.  It goes up whenever a wire or clasp is 
+# connected or disconnected, so results that only depend on how the circuit
+# is wired can be kept until it changes.
+TOPOLOGY = 0
+
+def change_topology():
+    """ Marks the wiring as changed. """
+    
+    global TOPOLOGY
+    
+    TOPOLOGY += 1
+
+def get_topology():
+    """ Returns the version of the wiring. """
+    
+    return TOPOLOGY
+
 #
 # ELEMENT CLASSES 
 #
@@ -247,6 +269,8 @@ class Pad:
             self.connector.append(connector)
         else:
             self.connector = connector
+        
+        change_topology()
     
     def get_position(self):
         
@@ -279,19 +303,48 @@ class Pad:
     
     def program(self):
         """ Manages the behavior of the pad during the programming chain
-            that turns a wiring diagram into a logical statement. """
+            that turns a wiring diagram into a logical statement.  The 
+            chain is traced by program_circuit.
+        """
+        
+        return program_circuit(self)
+    
+    def get_sources(self):
+        """ Returns what the pad takes its value from: the wire connected
+            to an input pad, or the element owning an output pad. 
+        """
+        
+        if self.type == "Output":
             
-        if self.type == "Input" and self.connector:
+            return [self.container]
+        
+        elif self.connector:
             
-            return self.connector.program()
+            return [self.connector]
         
-        elif self.type == "Output":
+        return []
+    
+    def build_program(self,programs):
+        """ Passes the program of the pad's source along the programming
+            chain, given the programs of its sources. 
+        """
+        
+        if programs:
             
-            return self.container.program()
+            return programs[0]
         
-        else:
-
+        return None
+    
+    def combine_values(self,values):
+        """ Passes the value of the pad's source along the evaluation 
+            chain, given the values of its sources. 
+        """
+        
+        if not self.connector or not values:
+            
             return None
+        
+        return values[0]
     
     def disconnect(self,connected = None):
         """ Remove the wire from the terminal, returns the wire. """
@@ -309,6 +362,8 @@ class Pad:
             wire = self.connector
             self.connector = None
         wire.disconnect(self)
+        
+        change_topology()
 
         return wire
         
@@ -334,22 +389,12 @@ class Pad:
             
             return False
 
-    def evaluate(self, previous = []):
-        """ Passes the pad through the evaluation chain. """
-        
-        if not self.connector:
-            
-            return None
-        
-        if self.type == "Input":
-            
-            value = self.connector.evaluate(previous)
+    def evaluate(self):
+        """ Passes the pad through the evaluation chain, traced by 
+            evaluate_circuit.
+        """
         
-        else:
-            
-            value = self.container.evaluate(previous)
-            
-        return value
+        return evaluate_circuit(self)
 
     def get_value(self):
         """ Passes the pad through the evaluation chain. """
@@ -452,6 +497,8 @@ class LogicClasp(Pad):
         
         self.connector.append(wire)
         
+        change_topology()
+        
     def is_clasp(self):
         return True
         
@@ -489,6 +536,8 @@ class LogicClasp(Pad):
         wire.disconnect(self)
         
         self.container.remove_clasp(self)
+        
+        change_topology()
 
         return self.container
         
@@ -583,17 +632,49 @@ class LogicElement:
         self.replacement = Class
     
     def program(self):
-        """ Default programming behavior for a device: passthrough. 
-            Needs to be overwritten for most devices. 
+        """ Turns the wiring feeding the device into a logical statement,
+            or None if it is incomplete.  Devices say how they are 
+            programmed through get_sources and build_program, and the chain
+            is traced by program_circuit.
         """
-
+        
+        return program_circuit(self)
+    
+    def get_sources(self):
+        """ Returns the pads the device takes its inputs from.  Two 
+            terminal devices take them from their input pad.
+        """
+        
         if self.input:
             
-            return self.input.program()
+            return [self.input]
         
-        else:
+        return []
+    
+    def get_targets(self):
+        """ Returns the devices the device's output feeds: the wires 
+            connected to its output pad.
+        """
+        
+        return list(self.output.connector)
+    
+    def build_program(self,programs):
+        """ Makes the device's program from the programs of its sources.
+            Passthrough unless overwritten.
+        """
+        
+        if programs:
             
-            return None
+            return programs[0]
+        
+        return None
+    
+    def combine_values(self,values):
+        """ Finds the device's value from the values of its sources.
+            No value unless overwritten.
+        """
+        
+        return None
             
     
     def is_clicked(self,pos):
@@ -633,10 +714,14 @@ class LogicElement:
         
         self.reset_pads()
     
-    def evaluate(self,previous):
-        """ Evaluates the value of the device in the """ 
+    def evaluate(self):
+        """ Finds the value of the device from the switches, or None if the
+            wiring feeding it is incomplete.  Devices say how they are 
+            evaluated through get_sources and combine_values, and the chain
+            is traced by evaluate_circuit.
+        """
         
-        return None
+        return evaluate_circuit(self)
         
     def is_locked(self):
         """ Chekcs to see if the device is locked in place.  Probably shouldn't
@@ -711,6 +796,7 @@ class LogicWire(LogicElement):
         self.container   = None
         self.replacement = None
         self.clasps      = []
+        self.value       = None
         
         if node and node.get_type() == "Output":
         
@@ -759,6 +845,8 @@ class LogicWire(LogicElement):
             
             wire = clasp.acquire_wire()
             self.clasps.remove(clasp)
+            
+            change_topology()
         
         return wire
         
@@ -768,6 +856,8 @@ class LogicWire(LogicElement):
             self.clasps.append(clasp)
             self.update_clasps()
             
+            change_topology()
+            
     def add_clasp(self,pos):
         """ Adds a probe to the wire so that another wire can be connected
             to it.
@@ -789,6 +879,8 @@ class LogicWire(LogicElement):
         
         self.clasps.append(new_clasp)
         
+        change_topology()
+        
         return new_clasp
 
     def get_pads(self):
@@ -956,18 +1048,35 @@ class LogicWire(LogicElement):
         
         self.update_clasps()
     
-    def evaluate(self,previous = []):
-        """ Passes the input state to the output state in the evaluation
-            chain.
+    def get_targets(self):
+        """ Returns the devices the wire feeds: the owner of the pad at its
+            output and the wires connected to its clasps.
         """
         
-        if self.input:
+        targets = []
+        
+        if self.output:
+            targets.append(self.output.get_owner())
+        
+        for clasp in self.clasps:
+            targets += clasp.connector
+        
+        return targets
+    
+    def combine_values(self,values):
+        """ Passes the value at the wire's input to its output, keeping it
+            for the wires connected to the clasps.
+        """
+        
+        if values:
             
-            return self.input.evaluate(previous)
+            self.value = values[0]
         
         else:
             
-            return None  
+            self.value = None
+        
+        return self.value
             
     def connect(self,node):
         """ Connects the wire to the node (device terminal) if it can. 
@@ -1010,6 +1119,8 @@ class LogicWire(LogicElement):
             
             return False
         
+        change_topology()
+        
         return True
     
     def disconnect(self,node):
@@ -1022,6 +1133,8 @@ class LogicWire(LogicElement):
         else:
             
             self.output = None
+        
+        change_topology()
     
     
     def get_endpoints(self):
@@ -1119,38 +1232,27 @@ class LogicNot(LogicElement):
         
         self.output.set_position(output_pos)
         
-    def program(self):
-        """ Programming behavior for the not-gate during answer validation. """
+    def build_program(self,programs):
+        """ Makes the Not of the program wired into the gate. """
         
-        input_terminal = self.input.program()
-        
-        if input_terminal:
-                
-            return Not(input_terminal)
+        if programs and programs[0]:
+            
+            return Not(programs[0])
         
         return None
+    
+    def combine_values(self,values):
+        """ Finds the value of the gate from the value of its input. """
         
-    def evaluate(self,previous = []):
-        """ Evaluation behavior for the gate when determining logic flow 
-            from the switches. 
-        """
-        
-        if self in previous:
-            return None
-        
-        previous.append(self)
-        
-        value = self.input.evaluate(previous)
-        
-        if value != None:
-        
-            self.value = not value
+        if values and values[0] != None:
+            
+            self.value = not values[0]
         
         else:
             
             self.value = None
         
-        return self.value  
+        return self.value
         
         
 
@@ -1181,6 +1283,11 @@ class Logic3Terminal(LogicElement):
     def get_size(self):
         
         return (self.w,self.h)
+    
+    def get_sources(self):
+        """ Returns both input pads of the gate. """
+        
+        return [self.input_A,self.input_B]
 
 class LogicOr(Logic3Terminal):
     """ A three terminal Or gate. """
@@ -1214,40 +1321,26 @@ class LogicOr(Logic3Terminal):
         
         return "Or"
         
-    def program(self):
-        """ Programming behavior for the Or gate when the  
-        """
+    def build_program(self,programs):
+        """ Makes the Or of the programs wired into the gate. """
         
-        input_A = self.input_A.program()
-            
-        input_B = self.input_B.program()
-    
-        if input_A and input_B:
+        if len(programs) == 2 and programs[0] and programs[1]:
             
-            return Or(self.input_A.program(),self.input_B.program())
-            
-        return None    
-    
-    def evaluate(self,previous = []):
-        """ Evaluates the value of the gate using its inputs. """
-        
-        if self in previous:
-            return None
+            return Or(programs[0],programs[1])
         
-        previous.append(self)
+        return None
+    
+    def combine_values(self,values):
+        """ Finds the value of the gate from the values of its inputs. """
         
-        value_A = self.input_A.evaluate(previous)
+        if len(values) == 2 and values[0] != None and values[1] != None:
             
-        value_B = self.input_B.evaluate(previous)
+            self.value = values[0] or values[1]
         
-        if value_A != None and value_B != None:
-            
-            self.value = value_A or value_B
-            
         else:
             
             self.value = None
-            
+        
         return self.value
         
         
@@ -1283,41 +1376,26 @@ class LogicAnd(Logic3Terminal):
         
         return "And"
     
-    def program(self):
-        """ Programming behavior for an And gate in answer validation. """
+    def build_program(self,programs):
+        """ Makes the And of the programs wired into the gate. """
         
-        input_A = self.input_A.program()
-            
-        input_B = self.input_B.program()
-    
-        if input_A and input_B:
-            
-            return And(self.input_A.program(),self.input_B.program())
+        if len(programs) == 2 and programs[0] and programs[1]:
             
+            return And(programs[0],programs[1])
+        
         return None
     
-    def evaluate(self,previous = []):
-        """ Evalutes the value of the gate using the values of its 
-            terminals. 
-        """
-        
-        if self in previous:
-            return None
-        
-        previous.append(self)
+    def combine_values(self,values):
+        """ Finds the value of the gate from the values of its inputs. """
         
-        value_A = self.input_A.evaluate(previous)
+        if len(values) == 2 and values[0] != None and values[1] != None:
             
-        value_B = self.input_B.evaluate(previous)
+            self.value = values[0] and values[1]
         
-        if value_A != None and value_B != None:
-            
-            self.value = value_A and value_B
-            
         else:
             
             self.value = None
-            
+        
         return self.value
         
 class Factory(LogicElement):
@@ -1392,6 +1470,8 @@ class LogicGround(LogicElement):
         self.answer = []
         self.user = []
         
+        self.value = None
+        
         self.locked = True
         
         self.x = 0
@@ -1405,6 +1485,11 @@ class LogicGround(LogicElement):
 
         return "Ground"
     
+    def get_targets(self):
+        """ The ground has no output, so it feeds nothing. """
+        
+        return []
+    
     def reset_pads(self):
         """ Resets the position of the input pad. """
         
@@ -1439,6 +1524,15 @@ class LogicLight(LogicElement):
         self.answer = []
         self.user = []
         
+        self.counterexample = None
+        
+        # The wiring version and buttons the counterexample was found for.
+        self.checked = None
+        
+        # The player's circuit compiled into a netlist.  Until the wiring
+        # changes, switches push their changes through to user_value.
+        self.netlist = None
+        
         self.locked = True
         
         self.x = 0
@@ -1465,20 +1559,60 @@ class LogicLight(LogicElement):
         """ Programs the light using the first node of the logic tree. """
         
         self.program = TruthTable(buttons,[first_node])
+        
+        self.checked = None
     
     def static_program(self,program):
         """ Programs the light with a truth table. """
         
         self.program = program
+        
+        self.checked = None
     
     def clear(self):
         """ Clear the value of the player's program from the light's memory. """
         
         self.user_value = None
     
+    def get_counterexample(self):
+        """ Returns the first switch combination where the player's circuit 
+            disagreed with the light's program at the last check, None if
+            they agreed, or INCOMPLETE if there was no circuit to check.
+        """
+        
+        return self.counterexample
+    
+    def get_value(self):
+        """ Returns the value the player's circuit gives the light. """
+        
+        return self.user_value
+    
+    def get_targets(self):
+        """ The light is where the circuit ends: it feeds nothing. """
+        
+        return []
+    
+    def combine_values(self,values):
+        """ Takes the value the player's circuit gives the light. """
+        
+        if values:
+            
+            self.user_value = values[0]
+        
+        else:
+            
+            self.user_value = None
+        
+        return self.user_value
+    
     def evaluate(self,buttons = None):
         """ Evaluates both the programmed (expected) value and the current
-            value of the user's input. 
+            value of the user's input.  The player's circuit is only traced,
+            compiled and checked against the program again when the wiring
+            has changed, so toggling switches and moving gates don't do any
+            of it again: toggled switches push their values to the light.
+            Tracing the circuit leaves every wire and gate feeding the light
+            holding its value, which the pushes start from.
         """
         
         if type(self.program) == list:
@@ -1490,31 +1624,38 @@ class LogicLight(LogicElement):
                 n *= 2
             self.answer_value = self.program[x]
         else:
-            self.answer_value = self.program.evaluate()
+            values = []
+            for button in buttons:
+                values.append(button.get_value())
+            self.answer_value = self.program.get_function(0)(*values)
+        
+        if self.netlist == None or self.netlist.get_buttons() != buttons:
+            
+            self.netlist = Netlist(self.input,buttons)
         
-        self.user_value = self.input.evaluate([self])
+        if self.netlist.update():
+            
+            self.user_value = evaluate_circuit(self.input)
     
         if buttons and self.user_value != None:
             
-            if type(self.program) == list:
-                
-                input_program = self.input.program()
-                
-                truth_table = TruthTable(buttons,[input_program])
+            checked = ( get_topology() , tuple(buttons) )
+            
+            if self.checked != checked and type(self.program) == list:
                 
-                if truth_table.compare(self.program):
-                    
-                    return True
+                self.counterexample = self.netlist.verify(self.program)
                 
-            else:
+            elif self.checked != checked:
+            
+                answer = self.program.get_value()[0]
             
-                input_program = self.input.program() 
+                self.counterexample = self.netlist.verify(answer)
             
-                truth_table = TruthTable(buttons,[self.program,input_program])
+            self.checked = checked
             
-                if truth_table.equal():
+            if self.counterexample == None:
                 
-                    return True
+                return True
    
     def draw(self,screen):
         
@@ -1609,15 +1750,19 @@ class LogicSwitch(LogicElement):
         
         self.output.set_position(output_pos)
     
-    def program(self):
-        """ Returns self as an input of the program in the programming chain."""
+    def get_sources(self):
+        """ Switches are where the circuit starts: they have no sources. """
+        
+        return []
+    
+    def build_program(self,programs):
+        """ Returns self as an input of the program. """
         
         return self
     
-    def evaluate(self,previous = []):
-        """ Pretends to do an evaluation, but instead just returns the 
-            status of the button. """
-            
+    def combine_values(self,values):
+        """ Returns the status of the button. """
+        
         return self.value
     
     def get_value(self):
@@ -1652,9 +1797,13 @@ class LogicSwitch(LogicElement):
         self.active = False
         
     def toggle(self):
-        ''' Switches the position of the button. '''
+        ''' Switches the position of the button, pushing its new value 
+            through the circuit it feeds.
+        '''
         
         self.value = not self.value
+        
+        propagate(self)
     
     def get_inputs(self):
         """ Returns the input nodes as if the button were a node.  """
@@ -1700,6 +1849,305 @@ class LogicSwitch(LogicElement):
 
 
 
+#
+# CIRCUIT TRACING
+#
+
+def trace(target,combine):
+    """ Works back through the pads, wires and gates feeding target, 
+        visiting each once and only after everything it takes input from.
+        combine(item,results) is called for each with the results already
+        found for its sources, and the result for target is returned.
+        The walk keeps its own stack, so circuits thousands of gates deep
+        are traced in linear time, and a source wired back into itself 
+        gives None.  What has been visited is kept local to the call, so 
+        checking it takes constant time and nothing is left over from one
+        trace to the next.
+    """
+    
+    results = {}
+    active = set()
+    
+    stack = [ ( target , False ) ]
+    
+    while stack:
+        
+        item , expanded = stack.pop()
+        
+        if expanded:
+            
+            values = []
+            for source in item.get_sources():
+                values.append(results.get(id(source)))
+            
+            results[id(item)] = combine(item,values)
+            
+            active.remove(id(item))
+        
+        elif id(item) not in results and id(item) not in active:
+            
+            active.add(id(item))
+            
+            stack.append( ( item , True ) )
+            
+            for source in reversed(item.get_sources()):
+                stack.append( ( source , False ) )
+    
+    return results.get(id(target))
+
+def program_circuit(target):
+    """ Turns the wiring diagram feeding target into a logical statement,
+        or None if the wiring is incomplete.  Each element is programmed
+        once, so gates feeding several others give one shared node and 
+        programming takes time linear in the gates and wires.
+    """
+    
+    return trace(target,lambda item,programs: item.build_program(programs))
+
+def evaluate_circuit(target):
+    """ Finds the value reaching target from the switches, or None if the
+        wiring is incomplete.  Gates keep the values found for them.
+    """
+    
+    return trace(target,lambda item,values: item.combine_values(values))
+
+
+#
+# LIVE SIMULATION
+#
+
+def propagate(source):
+    """ Pushes a change in the value of source, such as a switch being
+        toggled, forward through the wires and gates it feeds, following
+        the wires connected to each output pad and clasp.  The devices
+        downstream are put in order, each after everything it feeds from,
+        and each with a changed input is recomputed from the values its
+        inputs hold.  The push stops at any device whose value doesn't 
+        change.  Devices wired into a loop have no value, as when the 
+        circuit is traced.  The values held by the devices feeding those
+        downstream must be current, as they are after evaluate_circuit, so
+        lights trace their circuits again whenever the wiring changes.
+    """
+    
+    order = []
+    looped = set()
+    active = set()
+    done = set()
+    
+    stack = [ ( source , False ) ]
+    
+    while stack:
+        
+        item , expanded = stack.pop()
+        
+        if expanded:
+            
+            active.remove(id(item))
+            done.add(id(item))
+            
+            order.append(item)
+        
+        elif id(item) in active:
+            
+            looped.add(id(item))
+        
+        elif id(item) not in done:
+            
+            active.add(id(item))
+            
+            stack.append( ( item , True ) )
+            
+            for target in item.get_targets():
+                stack.append( ( target , False ) )
+    
+    order.reverse()
+    
+    changed = set()
+    for target in source.get_targets():
+        changed.add(id(target))
+    
+    for item in order[1:]:
+        
+        if id(item) not in changed and id(item) not in looped:
+            continue
+        
+        values = []
+        for pad in item.get_sources():
+            if id(item) in looped:
+                values.append(None)
+            else:
+                values.append(pad.get_value())
+        
+        old = item.get_value()
+        
+        if item.combine_values(values) != old:
+            for target in item.get_targets():
+                changed.add(id(target))
+
+
+#
+# NETLISTS
+#
+
+# The operations of a compiled netlist.
+NET_SWITCH = 0
+NET_NOT = 1
+NET_OR = 2
+NET_AND = 3
+
+# The operation for each type of node in a flattened program.
+OPCODES = { "Variable" : NET_SWITCH , "Not" : NET_NOT , "Or" : NET_OR , 
+            "And" : NET_AND }
+
+# What Netlist.verify returns when there is no circuit to check because the
+# wiring feeding the target is incomplete.
+INCOMPLETE = "Incomplete"
+
+class Netlist:
+    """ The circuit feeding a target, such as a light's input pad, compiled
+        into flat arrays: an opcode for each switch and gate, in an order
+        where each comes after its inputs, with the positions of its inputs
+        in the order, or for a switch its position among the buttons.  The
+        circuit is run in one pass over the arrays, and is only compiled
+        again when the wiring topology changes.
+    """
+    
+    def __init__(self,target,buttons):
+        """ Sets up the netlist of the circuit feeding target over the 
+            buttons.  It is compiled the first time it is needed.
+        """
+        
+        self.target = target
+        self.buttons = list(buttons)
+        
+        self.version = None
+        
+        self.codes = array("i")
+        self.first = array("i")
+        self.second = array("i")
+    
+    def get_buttons(self):
+        """ Returns the buttons the netlist is compiled over. """
+        
+        return self.buttons
+    
+    def update(self):
+        """ Compiles the circuit again if the wiring has changed since it
+            was compiled.  Returns True if it was compiled again.
+        """
+        
+        if self.version == get_topology():
+            return False
+        
+        self.compile()
+        
+        return True
+    
+    def compile(self):
+        """ Programs the circuit and flattens the program into the arrays.
+            If the wiring is incomplete the arrays are left empty.
+        """
+        
+        self.version = get_topology()
+        
+        self.codes = array("i")
+        self.first = array("i")
+        self.second = array("i")
+        
+        program = program_circuit(self.target)
+        
+        if program == None:
+            return
+        
+        instructions , outputs = flatten([program],self.buttons)
+        
+        for instruction in instructions:
+            
+            self.codes.append(OPCODES[instruction[0]])
+            self.first.append(instruction[1])
+            
+            if len(instruction) > 2:
+                self.second.append(instruction[2])
+            else:
+                self.second.append(0)
+    
+    def run(self,inputs,full = True):
+        """ Runs the netlist in one pass and returns the value reaching the
+            target, or None if the wiring is incomplete.  inputs holds the 
+            value of each button, either True or False or, to run every 
+            row of a truth table at once, the button's column as a bitmask
+            with full the mask of every row.
+        """
+        
+        self.update()
+        
+        codes = self.codes
+        first = self.first
+        second = self.second
+        
+        if not codes:
+            return None
+        
+        values = []
+        
+        for index in xrange(len(codes)):
+            
+            code = codes[index]
+            
+            if code == NET_SWITCH:
+                values.append(inputs[first[index]])
+            elif code == NET_NOT:
+                values.append(full ^ values[first[index]])
+            elif code == NET_OR:
+                values.append(values[first[index]] | values[second[index]])
+            else:
+                values.append(values[first[index]] & values[second[index]])
+        
+        return values[-1]
+    
+    def evaluate(self):
+        """ Returns the value reaching the target from the buttons as they
+            are set, or None if the wiring is incomplete.
+        """
+        
+        values = []
+        for button in self.buttons:
+            values.append(button.get_value() == True)
+        
+        return self.run(values)
+    
+    def verify(self,answer):
+        """ Checks the circuit against an answer list over every row at 
+            once with bitmasks, as TruthTable.verify does.  Returns None if
+            they agree, INCOMPLETE if the wiring is incomplete, otherwise a
+            Counterexample holding the first row where they disagree.
+        """
+        
+        count = len(self.buttons)
+        
+        columns = []
+        for index in range(count):
+            columns.append(column_mask(index,count))
+        
+        mask = self.run(columns,full_mask(count))
+        
+        if mask == None:
+            return INCOMPLETE
+        
+        state = lowest_row(mask ^ pack_rows(answer))
+        
+        if state == None:
+            return None
+        
+        assignment = {}
+        for index in range(count):
+            assignment[self.buttons[index]] = bool(( state >> index ) & 1)
+        
+        values = ( not answer[state] , answer[state] )
+        
+        return Counterexample(state,assignment,values)
+
+
 #
 # DRAWING CONTAINER
 #
@@ -0,0 +1,326 @@
+#
+# Batch grading of saved circuits for Logic Lights
+#
+# Grades circuit files against their puzzles without the game, and so
+# without PyGame.  Run as
+#
+#     python LogicGrader.py [-o results.jsonl] [-p processes] files...
+#
+# to grade the files across a pool of worker processes, writing one JSON
+# line per file as soon as it is graded.
+#
+# A circuit file holds one item per line.  Blank lines and lines starting
+# with # are ignored.
+#
+#     puzzle 6                  the puzzle number, as in create_truth_table
+#     switches A B              the switches, in order
+#     not n1 A                  a Not gate named n1 wired to switch A
+#     or o1 n1 B                an Or gate wired to gate n1 and switch B
+#     and a1 o1 A               an And gate, likewise
+#     light o1                  what is wired into the light
+#
+# Gates may be listed in any order.
+#
+
+import json
+import sys
+
+from argparse import ArgumentParser
+from collections import OrderedDict
+from multiprocessing import Pool
+
+from LogicLogic import Not,Or,And,Variable,TruthTable,create_truth_table
+from LogicLogic import postorder,full_mask,count_gates
+from LogicIndex import PuzzleIndex
+
+# The node made by each kind of gate, and the number of inputs it takes.
+GATES = { "not" : ( Not , 1 ) , "or" : ( Or , 2 ) , "and" : ( And , 2 ) }
+
+# Circuit files are handed to the worker processes this many at a time.
+CHUNK_SIZE = 16
+
+# The puzzle index, opened by each worker process the first time it is
+# needed.
+INDEX = None
+
+class CircuitError(Exception):
+    """ Raised when a circuit file can't be read or its wiring is broken. """
+    
+    pass
+
+def read_circuit(lines):
+    """ Reads a circuit from the lines of a circuit file.  Returns the
+        puzzle number, the list of switch names, a dictionary from gate
+        names to the kind of gate and the names of its inputs, and the name
+        wired into the light.
+    """
+    
+    puzzle = None
+    switches = None
+    gates = {}
+    light = None
+    
+    for number in range(len(lines)):
+        
+        words = lines[number].split()
+        
+        if not words or words[0].startswith("#"):
+            continue
+        
+        where = "Line " + str(number + 1) + ": "
+        
+        item = words[0].lower()
+        
+        if item == "puzzle" and len(words) == 2 and words[1].isdigit():
+            
+            puzzle = int(words[1])
+        
+        elif item == "switches":
+            
+            switches = words[1:]
+            
+            for name in switches:
+                if switches.count(name) > 1:
+                    raise CircuitError(where + "Switch " + name +
+                                       " is listed twice.")
+        
+        elif item == "light" and len(words) == 2:
+            
+            light = words[1]
+        
+        elif item in GATES:
+            
+            if len(words) != GATES[item][1] + 2:
+                raise CircuitError(where + "Wrong number of inputs.")
+            
+            if words[1] in gates:
+                raise CircuitError(where + "Gate " + words[1] +
+                                   " is defined twice.")
+            
+            gates[words[1]] = ( item , words[2:] )
+        
+        else:
+            
+            raise CircuitError(where + "Can't read " +
+                               repr(lines[number].strip()))
+    
+    if puzzle == None or switches == None or light == None:
+        raise CircuitError("Needs a puzzle, switches and a light.")
+    
+    if puzzle > full_mask(len(switches)):
+        raise CircuitError("There is no puzzle " + str(puzzle) + " for " +
+                           str(len(switches)) + " switches.")
+    
+    for name in switches:
+        if name in gates:
+            raise CircuitError("Gate " + name + " has the name of a switch.")
+    
+    return puzzle , switches , gates , light
+
+def build_statement(variables,gates,light):
+    """ Builds the logical statement wired into the light.  variables is a
+        dictionary from switch names to Variables.  Gates are built after
+        their inputs by walking an explicit stack, so circuits of any depth
+        can be built.  Returns the statement and the number of gates it
+        uses.
+    """
+    
+    nodes = dict(variables)
+    active = set()
+    
+    stack = [light]
+    
+    while stack:
+        
+        name = stack[-1]
+        
+        if name in nodes:
+            stack.pop()
+            continue
+        
+        if name not in gates:
+            raise CircuitError("Nothing is named " + name + ".")
+        
+        kind , inputs = gates[name]
+        
+        missing = []
+        for input in inputs:
+            if input not in nodes:
+                missing.append(input)
+        
+        if missing:
+            
+            for input in missing:
+                if input in active:
+                    raise CircuitError("Gate " + input +
+                                       " is wired into itself.")
+            
+            active.add(name)
+            stack.extend(missing)
+            continue
+        
+        active.discard(name)
+        stack.pop()
+        
+        terminals = []
+        for input in inputs:
+            terminals.append(nodes[input])
+        
+        nodes[name] = GATES[kind][0](*terminals)
+    
+    statement = nodes[light]
+    
+    return statement , count_gates(statement)
+
+def write_circuit(circuit_file,puzzle,controls,statement):
+    """ Writes a statement over the controls, such as the program of a
+        player's circuit, to a circuit file that can be graded later.
+    """
+    
+    names = {}
+    
+    circuit_file.write("puzzle " + str(puzzle) + "\n")
+    
+    switches = []
+    for control in controls:
+        names[id(control)] = str(control.get_name())
+        switches.append(names[id(control)])
+    
+    circuit_file.write("switches " + " ".join(switches) + "\n")
+    
+    for node in postorder([statement]):
+        
+        inputs = node.get_inputs()
+        
+        if inputs == None:
+            continue
+        
+        names[id(node)] = "g" + str(len(names) - len(switches) + 1)
+        
+        line = [node.get_type().lower(),names[id(node)]]
+        for input in inputs:
+            line.append(names[id(input)])
+        
+        circuit_file.write(" ".join(line) + "\n")
+    
+    circuit_file.write("light " + names[id(statement)] + "\n")
+
+def get_index():
+    """ Returns the puzzle index, opening it the first time. """
+    
+    global INDEX
+    
+    if INDEX == None:
+        INDEX = PuzzleIndex()
+    
+    return INDEX
+
+def grade(filename):
+    """ Grades one circuit file against its puzzle.  Returns the result as
+        a dictionary ready to be written as JSON.
+    """
+    
+    result = OrderedDict()
+    result["file"] = filename
+    
+    try:
+        
+        circuit_file = open(filename,"r")
+        lines = circuit_file.readlines()
+        circuit_file.close()
+        
+        puzzle , switches , gates , light = read_circuit(lines)
+        
+        variables = OrderedDict()
+        for name in switches:
+            variables[name] = Variable(name)
+        
+        statement , used = build_statement(variables,gates,light)
+    
+    except ( IOError , CircuitError ) as error:
+        
+        result["error"] = str(error)
+        
+        return result
+    
+    controls = list(variables.values())
+    
+    answer = create_truth_table(controls,puzzle)
+    
+    counterexample = TruthTable(controls,[statement]).verify(answer)
+    
+    result["puzzle"] = puzzle
+    result["switches"] = len(controls)
+    result["gates"] = used
+    result["passed"] = counterexample == None
+    
+    if counterexample != None:
+        
+        assignment = OrderedDict()
+        for control in controls:
+            assignment[control.get_name()] = \
+                counterexample.get_assignment()[control]
+        
+        result["counterexample"] = assignment
+    
+    else:
+        
+        stars = get_index().get_stars(len(controls),puzzle,used)
+        
+        if stars != None:
+            result["known"] = get_index().get_gates(len(controls),puzzle)
+            result["stars"] = stars
+    
+    return result
+
+def grade_files(filenames,output,processes = None,chunksize = CHUNK_SIZE):
+    """ Grades circuit files across a pool of worker processes, handing
+        them out chunksize at a time, and writes each result to output as
+        a line of JSON as soon as it is ready.  Results are written in the
+        order of the files.  Returns the number of circuits that passed.
+    """
+    
+    pool = Pool(processes)
+    
+    passed = 0
+    
+    for result in pool.imap(grade,filenames,chunksize):
+        
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+        
+        if result.get("passed"):
+            passed += 1
+    
+    pool.close()
+    pool.join()
+    
+    return passed
+
+def main():
+    """ Grades the circuit files named on the command line. """
+    
+    parser = ArgumentParser(description = "Grade Logic Lights circuits.")
+    parser.add_argument("files",nargs = "+")
+    parser.add_argument("-o","--output",default = None)
+    parser.add_argument("-p","--processes",type = int,default = None)
+    parser.add_argument("-c","--chunksize",type = int,default = CHUNK_SIZE)
+    
+    arguments = parser.parse_args()
+    
+    if arguments.output:
+        output = open(arguments.output,"w")
+    else:
+        output = sys.stdout
+    
+    passed = grade_files(arguments.files,output,arguments.processes,
+                         arguments.chunksize)
+    
+    if arguments.output:
+        output.close()
+    
+    sys.stderr.write(str(passed) + " of " + str(len(arguments.files)) +
+                     " circuits passed.\n")
+
+if __name__ == "__main__":
+    main()
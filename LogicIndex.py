@@ -0,0 +1,361 @@
+#
+# Known solution index for Logic Lights
+#
+# Running this module searches every puzzle of one to INDEX_INPUTS switches
+# for the fewest gates that solve it when no gate feeds more than one other,
+# and writes the results to INDEX_FILE.  The game lets gates feed several
+# others, so a puzzle can sometimes be solved with fewer: the counts are the
+# size of a known solution, not the fewest possible.  The game reads the
+# file through PuzzleIndex.
+#
+
+import mmap
+import os
+import struct
+
+from multiprocessing import Pool, cpu_count
+
+from LogicLogic import Not,Or,And,full_mask,column_mask
+from LogicNPN import get_classes
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The index file and the largest number of switches it covers.
+INDEX_FILE = "puzzles.idx"
+INDEX_INPUTS = 4
+
+# The file starts with HEADER and then holds one RECORD per puzzle, for one
+# switch, then two switches, and so on, in order of puzzle number.  Each
+# record holds the gates of the known solution to the puzzle, the last gate
+# of that solution, and the puzzles solved by that gate's inputs, so the
+# whole solution can be followed back from its record.
+HEADER = "LLIX"
+RECORD = struct.Struct("<BBHH")
+
+# The kinds of last gate in a record.  A SWITCH record needs no gates and
+# holds the number of the switch.
+SWITCH = 0
+NOT = 1
+OR = 2
+AND = 3
+
+# Each pair of gate counts is split into about this many tasks for the
+# worker processes.
+TASKS = 64
+
+# Solutions using at most this many gates more than the known solution get
+# two stars rather than one.
+STAR_MARGIN = 2
+
+class PuzzleIndex:
+    """ Looks up the known solutions of puzzles in the index file.  The
+        file is memory-mapped, so opening it reads nothing and each lookup
+        only touches one record.  If there is no index file every lookup
+        returns None.
+    """
+    
+    def __init__(self,filename = INDEX_FILE):
+        """ Opens the index file, if it has been built. """
+        
+        self.data = None
+        
+        if os.path.exists(filename):
+            
+            size = len(HEADER) + section_start(INDEX_INPUTS + 1) * RECORD.size
+            
+            index_file = open(filename,"rb")
+            
+            # A file that is empty, cut short or from some other build is
+            # treated as missing.  mmap cannot map an empty file.
+            if os.path.getsize(filename) == size:
+                
+                data = mmap.mmap(index_file.fileno(),0,access = mmap.ACCESS_READ)
+                
+                if data[:len(HEADER)] == HEADER:
+                    self.data = data
+            
+            index_file.close()
+    
+    def is_loaded(self):
+        """ Returns True if the index file was found. """
+        
+        return self.data != None
+    
+    def get_record(self,count,puzzle):
+        """ Returns the record of a puzzle for count switches as a tuple of
+            gate count, gate kind and the two input puzzles, or None if the
+            puzzle isn't in the index.
+        """
+        
+        if self.data == None or not 0 < count <= INDEX_INPUTS:
+            return None
+        
+        if not 0 <= puzzle <= full_mask(count):
+            return None
+        
+        offset = len(HEADER) + ( section_start(count) + puzzle ) * RECORD.size
+        
+        return RECORD.unpack_from(self.data,offset)
+    
+    def get_gates(self,count,puzzle):
+        """ Returns the gates used by the known solution to a puzzle, or 
+            None.  The puzzle may be solvable with fewer.
+        """
+        
+        record = self.get_record(count,puzzle)
+        
+        if record == None:
+            return None
+        
+        return record[0]
+    
+    def get_statement(self,buttons,puzzle):
+        """ Returns the known solution to a puzzle as a logical statement
+            over the buttons, or None.
+        """
+        
+        count = len(buttons)
+        
+        if self.get_record(count,puzzle) == None:
+            return None
+        
+        nodes = {}
+        stack = [puzzle]
+        
+        while stack:
+            
+            current = stack[-1]
+            
+            gates , kind , left , right = self.get_record(count,current)
+            
+            if kind == SWITCH:
+                inputs = []
+            elif kind == NOT:
+                inputs = [left]
+            else:
+                inputs = [left,right]
+            
+            missing = []
+            for input in inputs:
+                if input not in nodes:
+                    missing.append(input)
+            
+            if missing:
+                stack.extend(missing)
+                continue
+            
+            stack.pop()
+            
+            if kind == SWITCH:
+                nodes[current] = buttons[left]
+            elif kind == NOT:
+                nodes[current] = Not(nodes[left])
+            elif kind == OR:
+                nodes[current] = Or(nodes[left],nodes[right])
+            else:
+                nodes[current] = And(nodes[left],nodes[right])
+        
+        return nodes[puzzle]
+    
+    def get_stars(self,count,puzzle,gates):
+        """ Scores a solution using the given number of gates: three stars
+            for matching or beating the known solution, two for coming within
+            STAR_MARGIN of it and one otherwise.  Returns None if the puzzle
+            isn't in the index.
+        """
+        
+        best = self.get_gates(count,puzzle)
+        
+        if best == None:
+            return None
+        
+        if gates <= best:
+            return 3
+        
+        if gates <= best + STAR_MARGIN:
+            return 2
+        
+        return 1
+    
+    def get_difficulty(self,count):
+        """ Returns difficulty statistics for puzzles of count switches by
+            NPN class: a dictionary from the canonical form of each class to
+            the number of puzzles in it and the fewest and most gates used
+            by the known solution of any of them.  Negating switches or the
+            light costs Not gates, so the known solutions of a class don't 
+            all use the same number.  Returns
+            None if the index wasn't found.
+        """
+        
+        if self.get_record(count,0) == None:
+            return None
+        
+        statistics = {}
+        
+        for canonical , puzzles in get_classes(count).items():
+            
+            gates = []
+            for puzzle in puzzles:
+                gates.append(self.get_gates(count,puzzle))
+            
+            statistics[canonical] = ( len(puzzles) , min(gates) , max(gates) )
+        
+        return statistics
+
+def section_start(count):
+    """ Returns the number of records before those for count switches. """
+    
+    start = 0
+    
+    for smaller in range(1,count):
+        start += full_mask(smaller) + 1
+    
+    return start
+
+def combine(task):
+    """ Combines every puzzle in lefts with every puzzle in rights with an
+        Or gate and an And gate.  Returns a record for each puzzle solved
+        this way that isn't marked in known, as tuples of puzzle, gate
+        kind, left and right puzzles.  Runs in the worker processes.
+    """
+    
+    lefts , rights , known = task
+    
+    known = known.copy()
+    
+    found = []
+    
+    for left in lefts:
+        
+        for kind in ( OR , AND ):
+            
+            if kind == OR:
+                values = numpy.bitwise_or(rights,left)
+            else:
+                values = numpy.bitwise_and(rights,left)
+            
+            fresh = numpy.flatnonzero(~known[values])
+            
+            if len(fresh) == 0:
+                continue
+            
+            puzzles , first = numpy.unique(values[fresh],return_index = True)
+            
+            known[puzzles] = True
+            
+            for k in range(len(puzzles)):
+                right = rights[fresh[first[k]]]
+                found.append( ( int(puzzles[k]) , kind , int(left) , int(right) ) )
+    
+    return found
+
+def search(count,pool):
+    """ Finds a solution for every puzzle of count switches with the fewest
+        gates when no gate feeds more than one other.  Puzzles are solved 
+        in order of gate count: a puzzle needing n gates is the Not of one
+        needing n - 1, or the Or or And of two needing n - 1 between them.
+        Returns the list of records, by puzzle.
+    """
+    
+    full = full_mask(count)
+    
+    records = [None] * ( full + 1 )
+    known = numpy.zeros(full + 1,dtype = bool)
+    
+    level = []
+    for index in range(count):
+        puzzle = column_mask(index,count)
+        records[puzzle] = ( 0 , SWITCH , index , 0 )
+        known[puzzle] = True
+        level.append(puzzle)
+    
+    levels = [numpy.array(level,dtype = numpy.uint16)]
+    
+    remaining = full + 1 - count
+    
+    while remaining:
+        
+        gates = len(levels)
+        
+        found = []
+        
+        for puzzle in levels[-1]:
+            found.append( ( full ^ int(puzzle) , NOT , int(puzzle) , 0 ) )
+        
+        tasks = []
+        
+        for a in range(gates):
+            
+            b = gates - 1 - a
+            
+            if a > b:
+                break
+            
+            lefts = levels[a]
+            size = max(1,len(lefts) // TASKS)
+            
+            for start in range(0,len(lefts),size):
+                tasks.append( ( lefts[start:start + size] , levels[b] , known ) )
+        
+        for result in pool.map(combine,tasks):
+            found += result
+        
+        level = []
+        
+        for puzzle , kind , left , right in found:
+            
+            if not known[puzzle]:
+                
+                records[puzzle] = ( gates , kind , left , right )
+                known[puzzle] = True
+                level.append(puzzle)
+        
+        remaining -= len(level)
+        
+        levels.append(numpy.array(level,dtype = numpy.uint16))
+        
+        print count , "switches:" , len(level) , "puzzles need" , gates , "gates"
+    
+    return records
+
+def build_index(filename = INDEX_FILE,processes = None):
+    """ Searches every puzzle of up to INDEX_INPUTS switches across a pool
+        of worker processes and writes the index file.  The index is written
+        to a temporary file first and renamed into place, so an interrupted
+        build never leaves a partial index behind.
+    """
+    
+    if numpy == None:
+        print "Error: Building the index needs NumPy."
+        exit()
+    
+    if processes == None:
+        processes = cpu_count()
+    
+    pool = Pool(processes)
+    
+    temporary = filename + ".tmp"
+    
+    index_file = open(temporary,"wb")
+    index_file.write(HEADER)
+    
+    for count in range(1,INDEX_INPUTS + 1):
+        for record in search(count,pool):
+            index_file.write(RECORD.pack(*record))
+    
+    index_file.close()
+    
+    # Windows will not rename over an existing file.
+    if os.name == "nt" and os.path.exists(filename):
+        os.remove(filename)
+    
+    os.rename(temporary,filename)
+    
+    pool.close()
+    pool.join()
+
+if __name__ == "__main__":
+    build_index()
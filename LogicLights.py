@@ -13,6 +13,7 @@
 import random,math
 from LogicScreen import *
 from LogicGates  import *
+from LogicIndex  import PuzzleIndex
 from pygame.locals import *
 import pygame as pg
 from sys import exit
@@ -851,6 +852,8 @@ class Dude:
         
         self.stars = []
         
+        self.index = PuzzleIndex()
+        
         self.tutorial = None
         self.tutorial_active = False
 
@@ -862,6 +865,8 @@ class Dude:
             x += 175 
             n += 1
             current_level = LevelBox(n,(x,y),size,self)
+            
+            self.stars.append([None] * len(current_level.get_scores()))
         
             out = None
             for m in range(4**(n+1)):
@@ -880,18 +885,26 @@ class Dude:
         self.file = name
     
     def save(self):
-        """ Save the player's data. """
+        """ Save the player's data.  Each level's line holds a score for
+            every puzzle followed by the stars earned for every puzzle, one
+            digit each or - if none have been earned.
+        """
         
         newfile = open("ids/"+self.file+".idf","w")
         
-        for level in self.levels:
-            for score in level.get_scores():
+        for i in range(len(self.levels)):
+            for score in self.levels[i].get_scores():
                 if score == False:
                     newfile.write("Loss")
                 elif score == True:
                     newfile.write("Win ")
                 else:
                     newfile.write("None")
+            for stars in self.stars[i]:
+                if stars == None:
+                    newfile.write("-")
+                else:
+                    newfile.write(str(stars))
             newfile.write("\n")
         
         newfile.close()
@@ -899,7 +912,9 @@ class Dude:
         pass
     
     def load(self):
-        """ Loads the player's data. """
+        """ Loads the player's data.  Files saved before stars were kept
+            load with none.
+        """
         
         oldfile = open("ids/"+self.file+".idf","r")
         
@@ -917,6 +932,10 @@ class Dude:
                 else:
                     level.set_puzzle_value(n,None)
                 n += 1
+            stars = line[n * 4:]
+            for m in range(min(len(stars),len(self.stars[i]))):
+                if stars[m].isdigit():
+                    self.stars[i][m] = int(stars[m])
             level.make_list()
             i += 1    
         oldfile.close()
@@ -1021,7 +1040,23 @@ class Dude:
     def get_puzzle_stars(self,level,puzzle):
         """ Get the number of star's the player earned for the puzzle. """
          
-        return self.stars[level][puzzle]
+        return self.stars[level - 1][puzzle]
+    
+    def get_hint(self):
+        """ Returns a hint for the current puzzle: the gates used by the 
+            known solution in the puzzle index, which isn't always the 
+            fewest possible.  None if there isn't one.
+        """
+        
+        gates = self.index.get_gates(self.level,self.puzzle)
+        
+        if gates == None:
+            return None
+        
+        if gates == 1:
+            return "A known solution uses 1 gate"
+        
+        return "A known solution uses " + str(gates) + " gates"
         
     def set_puzzle(self,puzzle):
         """ Set the current puzzle. """
@@ -1041,14 +1076,26 @@ class Dude:
         
         self.result = None
     
-    def mark_win(self):
-        """ Registers a win in the level list. """
+    def mark_win(self,gates = None):
+        """ Registers a win in the level list.  If the number of gates used
+            is given, the win is scored in stars against the smallest known
+            solution to the puzzle, keeping the player's best score, which 
+            is saved with the level scores.
+        """
         
         self.result = True
         
         self.levels[self.level - 1].set_puzzle_value(self.puzzle,True)
         self.levels[self.level - 1].make_list()
         
+        if gates != None:
+            
+            stars = self.index.get_stars(self.level,self.puzzle,gates)
+            best = self.stars[self.level - 1][self.puzzle]
+            
+            if stars != None and ( best == None or stars > best ):
+                self.stars[self.level - 1][self.puzzle] = stars
+        
     def mark_loss(self):
         """ Registers that a level has been tried but not won. """
         
@@ -1064,6 +1111,10 @@ class Dude:
         screenprint(screen,self.name)
         current = str(self.level) + " - " + str(self.puzzle)
         screenprint(screen,current,(0,24))
+        
+        hint = self.get_hint()
+        if hint:
+            screenprint(screen,hint,(0,48))
 
 class Cursor:
     """ Current position of a person's hand.  May hold a logic element. """
@@ -2236,7 +2287,7 @@ def game(game):
             for light in lights:
                 win = light.evaluate(buttons)
                 if win:
-                    player.mark_win()
+                    player.mark_win(count_gates(light.input.program()))
                     if player.in_tutorial():
                         player.advance_tutorial()
                     game.set_next_state(3)
@@ -2,18 +2,62 @@
 # Base logic functions for Logic Lights
 #
 
-class Node:
-    """ Parent class for logical contructions. """
+from collections import OrderedDict
+from multiprocessing import Pool
+
+from LogicBDD import BDD,BDDLimit,order_variables
+from LogicSAT import miter
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Tables with at least this many inputs are evaluated with NumPy, when it
+# is installed, in chunks of NUMPY_CHUNK 64-row words per column.
+NUMPY_INPUTS = 20
+NUMPY_CHUNK = 2 ** 14
+
+# TruthTable.equal checks tables with at least this many inputs by building
+# binary decision diagrams rather than by evaluating every row.
+BDD_INPUTS = 16
+
+# Tables with at least this many inputs are too big to evaluate row by row.
+# If their diagrams grow too large they are checked with the SAT solver.
+SAT_INPUTS = 27
+
+# Number of truth-table signatures kept in the signature cache.
+SIGNATURE_CACHE = 1024
+
+# Number of compiled functions kept by compile_body.
+COMPILE_CACHE = 256
+
+# The 'parallel' method checks tables in blocks of 2^BLOCK_INPUTS rows, one
+# block per task for the worker processes.
+BLOCK_INPUTS = 20
+
+class Node(object):
+    """ Parent class for logical contructions.  Nodes keep their attributes
+        in slots rather than an instance dictionary, since large circuits
+        are built out of many of them.
+    """
+    
+    __slots__ = ("value","parents","dirty","volatile")
     
     def __init__(self):
         """ Initialize the node. """
         
         self.value = None
+        
+        self.parents = []
+        
+        self.dirty = False
+        self.volatile = False
     
     def __str__(self):
         """ Returns a string of the truth value of the node. """
         
-        return str(self.value)
+        return str(self.get_value())
         
     def get_name(self):
         """ Returns the name of the node.  Usually only Variables are
@@ -37,15 +81,102 @@ class Node:
         return True
         
     def evaluate(self):
-        """ Determines the truth value of the node. """
+        """ Determines the truth value of the node, recomputing it and
+            every node it depends on, inputs first.
+        """
+        
+        for node in postorder([self]):
+            
+            if isinstance(node,Node) and node.get_inputs() != None:
+                
+                node.value = node.compute()
+                
+                node.dirty = False
         
         return self.value
 
     def get_value(self):
-        """ Returns the last evaluated value of the node. """
+        """ Returns the value of the node.  Only recomputes the value if
+            an input has changed since it was last found; nodes with inputs
+            that are not Nodes can't be told of changes and always 
+            recompute.  Out of date inputs are brought up to date first.
+        """
+        
+        if self.dirty or self.volatile:
+            refresh([self])
+        
+        return self.value
+    
+    def compute(self):
+        """ Finds the value of the node from the values last found for its 
+            inputs, which must be up to date.  Needs to be overwritten by 
+            nodes with inputs.
+        """
         
         return self.value
     
+    def add_parent(self,parent):
+        """ Records a node that takes this node as an input. """
+        
+        self.parents.append(parent)
+    
+    def attach(self):
+        """ Registers the node with each of its inputs, so that changes to 
+            the inputs mark it out of date.
+        """
+        
+        for input in self.get_inputs():
+            
+            if isinstance(input,Node):
+                
+                input.add_parent(self)
+                
+                if input.volatile:
+                    self.volatile = True
+            
+            else:
+                
+                self.volatile = True
+    
+    def invalidate(self):
+        """ Marks the node and every node depending on it as out of date.
+            Nodes that are already out of date have out of date parents, so
+            the marking stops there.
+        """
+        
+        stack = [self]
+        
+        while stack:
+            
+            node = stack.pop()
+            
+            if not node.dirty:
+                
+                node.dirty = True
+                
+                stack.extend(node.parents)
+    
+    def evaluate_mask(self,full,memo = None):
+        """ Evaluates the node over every row of a truth table at once.
+            Bit s of the returned mask is the value of the node in state s;
+            full is the mask with every row set.  The masks may be integers 
+            or packed NumPy words.  The memo dictionary holds the masks of
+            nodes already evaluated, so that shared nodes are evaluated once.
+        """
+        
+        return evaluate_masks([self],full,memo)[0]
+    
+    def column(self,full,memo):
+        """ Returns the column of the node in the truth table, given the
+            columns of its inputs in memo.  Constant nodes fill every row
+            with their value.
+        """
+        
+        if self.value:
+            return full
+        
+        return full ^ full
+    
     def get_inputs(self):
         """ Returns the input nodes to the current node.  """
         
@@ -56,12 +187,20 @@ class Not(Node):
                     True -> False       False -> True
     """
     
+    __slots__ = ("terminal",)
+    
     def __init__(self, input_terminal):
-        """ Initializes the not node, specifying its input node. """
+        """ Initializes the not node, specifying its input node.  The value
+            isn't found until it is asked for.
+        """
+        
+        Node.__init__(self)
         
         self.terminal = input_terminal
         
-        self.evaluate()
+        self.dirty = True
+        
+        self.attach()
         
     def get_type(self):
         """ Returns a string describing the type of node, i.e., Not. """
@@ -73,12 +212,15 @@ class Not(Node):
         
         return Not
     
-    def evaluate(self):
-        """ Evaluates the truth value of the node. """
+    def compute(self):
+        """ Finds the value of the node from the value of its input. """
         
-        self.value = not self.terminal.evaluate()
+        return not current_value(self.terminal)
+    
+    def column(self,full,memo):
+        """ Finds the column of the node in a truth table: every row flips. """
         
-        return self.value
+        return full ^ memo[id(self.terminal)]
     
     def get_inputs(self):
         """ Returns the inputs to the node. """
@@ -93,15 +235,21 @@ class Or(Node):
             False True -> True  False False -> False
     """
         
+    __slots__ = ("terminal_a","terminal_b")
+    
     def __init__(self, left, right):
-        """ Sets up the Or node, keeping the two input nodes and evaluating
-            its truth condition.
+        """ Sets up the Or node, keeping the two input nodes.  Its truth 
+            condition isn't evaluated until it is asked for.
         """
         
+        Node.__init__(self)
+        
         self.terminal_a = left
         self.terminal_b = right
         
-        self.evaluate()
+        self.dirty = True
+        
+        self.attach()
         
     def get_type(self):
         """ Returns the name of the operation. """
@@ -113,12 +261,18 @@ class Or(Node):
         
         return Or
         
-    def evaluate(self):
-        """ Evalutates the current truth-value of the node. """
+    def compute(self):
+        """ Finds the value of the node from the values of its inputs. """
         
-        self.value = self.terminal_a.evaluate() or self.terminal_b.evaluate()
+        a = current_value(self.terminal_a)
+        b = current_value(self.terminal_b)
         
-        return self.value
+        return a or b
+    
+    def column(self,full,memo):
+        """ Finds the column of the node in a truth table in one operation. """
+        
+        return memo[id(self.terminal_a)] | memo[id(self.terminal_b)]
     
     def get_inputs(self):
         """ Returns the input nodes. """
@@ -132,15 +286,21 @@ class And(Node):
             False True -> False  False False -> False
     """
     
+    __slots__ = ("terminal_a","terminal_b")
+    
     def __init__(self, left, right):
-        """ Sets up the And node, keeping the two input nodes and evaluating
-            its truth condition.
+        """ Sets up the And node, keeping the two input nodes.  Its truth 
+            condition isn't evaluated until it is asked for.
         """
         
+        Node.__init__(self)
+        
         self.terminal_a = left
         self.terminal_b = right
         
-        self.evaluate()
+        self.dirty = True
+        
+        self.attach()
     
     def get_type(self):
         """ Returns the name of the operation. """
@@ -152,12 +312,18 @@ class And(Node):
         
         return And
         
-    def evaluate(self):
-        """ Evalutates the current truth-value of the node. """
+    def compute(self):
+        """ Finds the value of the node from the values of its inputs. """
         
-        self.value = self.terminal_a.evaluate() and self.terminal_b.evaluate()
+        a = current_value(self.terminal_a)
+        b = current_value(self.terminal_b)
         
-        return self.value
+        return a and b
+    
+    def column(self,full,memo):
+        """ Finds the column of the node in a truth table in one operation. """
+        
+        return memo[id(self.terminal_a)] & memo[id(self.terminal_b)]
     
     def get_inputs(self):
         """ Returns the input nodes. """
@@ -168,9 +334,13 @@ class And(Node):
 class Value(Node):
     """ This is a constant-valued leaf for the logic tree. """
     
+    __slots__ = ("terminal",)
+    
     def __init__(self,value):
         """ Creates a node with a constant value of value. """ 
         
+        Node.__init__(self)
+        
         self.value = value
         self.terminal = None
         
@@ -187,14 +357,20 @@ class Value(Node):
 class Variable(Node):
     """ This is leaf whose value can be changed by the program. """
     
+    __slots__ = ("name","terminal","mask")
+    
     def __init__(self,name):
         """ Sets up the variable with a variable name. """
         
+        Node.__init__(self)
+        
         self.name = name
         
         self.value = False
         self.terminal = None
         
+        self.mask = 0
+        
     def get_type(self):
         """ Returns the name of the variable. """
         
@@ -213,20 +389,155 @@ class Variable(Node):
         return self.name
     
     def set(self,value):
-        """ Sets the variable to a predetermined value. """
+        """ Sets the variable to a predetermined value, marking the nodes
+            that depend on it out of date if the value changes.
+        """
         
-        self.value = value
+        if value != self.value:
+            
+            self.value = value
+            
+            for parent in self.parents:
+                parent.invalidate()
     
     def toggle(self):
         """ Swaps between truth values. """
         
-        self.value = not self.value
+        self.set(not self.value)
+    
+    def set_mask(self,mask):
+        """ Sets the column of the variable used when a whole truth table
+            is evaluated at once.
+        """
+        
+        self.mask = mask
+    
+    def column(self,full,memo):
+        """ Returns the variable's column of the truth table. """
+        
+        return self.mask
+        
+
+class NodeFactory:
+    """ Builds nodes through a unique table.  Asking for a node with the 
+        same type and the same input nodes as one already built returns the
+        existing node, so expressions built by a factory are shared DAGs
+        rather than trees.
+    """
+    
+    def __init__(self):
+        """ Creates an empty unique table. """
+        
+        self.table = {}
+        
+    def make(self,Class,inputs):
+        """ Returns the node of class Class over the list of inputs, 
+            building it only if the factory has not already done so.
+        """
+        
+        key = [Class]
+        for input in inputs:
+            key.append(id(input))
+        key = tuple(key)
+        
+        if key not in self.table:
+            self.table[key] = Class(*inputs)
+        
+        return self.table[key]
+    
+    def value(self,value):
+        """ Returns the shared constant leaf for a truth value. """
+        
+        key = ( Value , bool(value) )
+        
+        if key not in self.table:
+            self.table[key] = Value(bool(value))
+        
+        return self.table[key]
+    
+    def get_size(self):
+        """ Returns the number of distinct nodes the factory has built. """
+        
+        return len(self.table)
+        
+
+class SignatureCache:
+    """ A bounded cache from the structure hash of an expression over an 
+        ordered set of variables to its truth-table signature, the column 
+        of the expression as a bitmask.  When full, the entry used least 
+        recently is dropped.  compile_body keeps its functions in one too.
+    """
+    
+    def __init__(self,size = SIGNATURE_CACHE):
+        """ Creates an empty cache holding up to size signatures. """
+        
+        self.size = size
+        
+        self.entries = OrderedDict()
+        
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self,key):
+        """ Returns the signature stored under key, or None if there isn't
+            one.
+        """
+        
+        if key in self.entries:
+            
+            self.hits += 1
+            
+            signature = self.entries.pop(key)
+            self.entries[key] = signature
+            
+            return signature
+        
+        self.misses += 1
+        
+        return None
+    
+    def put(self,key,signature):
+        """ Stores a signature, dropping the least recently used one if the
+            cache is full.
+        """
+        
+        if key in self.entries:
+            del self.entries[key]
+        
+        self.entries[key] = signature
+        
+        if len(self.entries) > self.size:
+            self.entries.popitem(False)
+    
+    def clear(self):
+        """ Empties the cache and resets its counters. """
+        
+        self.entries.clear()
+        
+        self.hits = 0
+        self.misses = 0
+    
+    def get_hits(self):
+        """ Returns the number of lookups answered from the cache. """
+        
+        return self.hits
+    
+    def get_misses(self):
+        """ Returns the number of lookups that were not in the cache. """
+        
+        return self.misses
+    
+    def get_size(self):
+        """ Returns the number of signatures in the cache. """
+        
+        return len(self.entries)
         
 
 class TruthTable:
     """ Creates a truth table from a set of inputs and outputs, creating
         a specific value for the outputs, allowing truth functions to be
-        compared. 
+        compared.  Nothing is computed until it is asked for, and the 
+        columns of the table are kept packed into bits.
     """
         
     def __init__(self,inputs,outputs):
@@ -237,41 +548,91 @@ class TruthTable:
         
         self.controls = tuple(inputs)
         
-        self.create_dictionary()
-        
         self.originals = tuple(outputs)
         
-        self.reformat_statements()
+        # The parts of the table are built the first time they are asked 
+        # for, so that nothing is computed until it is needed.
+        self.internals = None
+        self.relationships = None
+        self.statements = None
+        self.factory = None
+        self.memo = None
+        self.support = None
+        self.reduced = None
+        
+        self.columns = None
+    
+    def get_internals(self):
+        """ Returns the Variables standing in for the controls, in order. """
+        
+        if self.internals == None:
+            self.create_dictionary()
+        
+        return self.internals
+    
+    def get_relationships(self):
+        """ Returns the dictionary from the controls to their Variables. """
+        
+        if self.relationships == None:
+            self.create_dictionary()
+        
+        return self.relationships
+    
+    def get_statements(self):
+        """ Returns the simplified copies of the outputs over the internal
+            Variables.
+        """
+        
+        if self.statements == None:
+            self.reformat_statements()
+        
+        return self.statements
+    
+    def get_support(self):
+        """ Returns the sorted indices of the internal Variables that the 
+            statements depend on.
+        """
+        
+        if self.support == None:
+            self.find_support()
         
-        self.value = self.evaluate()
+        return self.support
     
     def __str__(self):
         """ Prints out the truth table. """
         
-        switches = self.internals
-        lights = self.statements
-        
         output = ""
         
-        for state in range(2 ** len(switches)):
-            temp_state = state
+        for state , inputs , outputs in self.rows():
             print state,
-            for input in switches:
-                x = temp_state % 2 
-                temp_state //= 2
-                if x:
-                    input.set(True)
-                else:
-                    input.set(False)
-                print input,
+            for value in inputs:
+                print value,
             print " | ",
-            for statement in lights:
-                statement.evaluate()
-                print statement,
+            for value in outputs:
+                print value,
             print
             
         return output
     
+    def rows(self):
+        """ Yields the rows of the table in order, as the state of the row
+            with tuples of the input values and the statement values.  Rows
+            are computed one at a time as they are asked for, so the whole
+            table never needs to be held in memory.
+        """
+        
+        function = self.get_row_function()
+        
+        count = len(self.get_internals())
+        
+        for state in xrange(2 ** count):
+            
+            values = []
+            for index in range(count):
+                values.append(bool(( state >> index ) & 1))
+            
+            yield state , tuple(values) , function(*values)
+    
     def create_dictionary(self):
         """ Takes a set of programmer/user controllable variables or buttons, 
             converts them into a duplicate set of Variables, and creates a
@@ -292,156 +653,1419 @@ class TruthTable:
     def reformat_statements(self):
         """ Takes the problem statement and converts it into something 
             tractable for making a truth table, using the new leaves created
-            when putting the dictionary. 
+            when putting the dictionary.  The copies are simplified, so 
+            statements that only differ trivially end up the same, and the
+            simplification memo keeps the structure hash of every node.
         """
         
         statements = []
         
+        self.factory = NodeFactory()
+        
+        memo = {}
+        
         for statement in self.originals:
-            statements.append(copy_node(statement,self.relationships))
+            statement = copy_node(statement,self.get_relationships(),
+                                  self.factory)
+            statement = simplify(statement,self.factory,memo)
+            statements.append(statement)
         
         self.statements = statements
+        self.memo = memo
     
-    def evaluate(self):
+    def find_support(self):
+        """ Finds the support of the statements, the sorted indices of the
+            internal variables they depend on.  The variables the statements
+            reach are found first, then each of those is dropped if every
+            statement has the same value whichever way it is set, checked
+            by comparing the two halves of the statements' columns.  Those
+            columns are then projected down to the support and kept for 
+            get_reduced_masks.  If the statements reach BDD_INPUTS variables
+            or more, all of them are kept without checking.
+        """
+        
+        internals = self.get_internals()
+        statements = self.get_statements()
+        
+        positions = {}
+        for index in range(len(internals)):
+            positions[id(internals[index])] = index
+        
+        reached = []
+        for node in postorder(statements):
+            if id(node) in positions:
+                reached.append(positions[id(node)])
+        
+        reached.sort()
+        
+        if len(reached) >= BDD_INPUTS:
+            self.support = reached
+            self.reduced = None
+            return
+        
+        masks = evaluate_masks(statements,self.set_masks(reached))
+        
+        support = []
+        
+        for index in range(len(reached)):
+            for mask in masks:
+                if depends_on(mask,index,len(reached)):
+                    support.append(reached[index])
+                    break
+        
+        kept = []
+        for index in range(len(reached)):
+            if reached[index] in support:
+                kept.append(index)
+        
+        reduced = []
+        for mask in masks:
+            reduced.append(project_mask(mask,kept,len(reached)))
+        
+        self.support = support
+        self.reduced = reduced
+    
+    def evaluate(self,method = None):
         """ Evaluates the value of the truth table.  The value of the 
             table is presented in columns of 2^(# of inputs) height,
             starting from all elements False and going to all elements
-            True.
+            True, unpacked from get_columns.  The method 'gray' sweeps the
+            rows one variable change at a time instead of evaluating whole
+            columns.
         """
         
         value = []
-        number = 0
-        for statement in self.statements:
-            number += 1
-            row = []
-            for state in range(2 ** len(self.internals)):
-                temp_state = state
-           
-                for input in self.internals:
-                    x = temp_state % 2 
-                    temp_state //= 2
-                    if x:
-                        input.set(True)
-                    else:
-                        input.set(False)
-                row.append(statement.evaluate())
-            value.append(row)
-        return value
-    
-    def get_value(self):
-        """ Returns the value of the truth table. """
         
-        return self.value
+        if method == "gray":
+            
+            rows = 2 ** len(self.get_internals())
+            
+            for statement in self.get_statements():
+                value.append([None] * rows)
+            
+            for state , row in self.sweep():
+                for index in range(len(row)):
+                    value[index][state] = row[index]
+            
+            return value
         
-    def equal(self):
-        """ Determines if two statements are equal. """
+        rows = 2 ** len(self.get_internals())
         
-        if len(self.statements) == 2:
+        for column in self.get_columns():
             
-            result = True
+            if self.use_numpy():
+                value.append(unpack_words(column).tolist())
+            else:
+                value.append(unpack_mask(column,rows))
             
-            switches = list(self.internals)
-            lights = list(self.statements)
+        return value
+    
+    def get_columns(self):
+        """ Returns the column of each statement packed into bits: an 
+            integer bitmask, or for tables evaluated with NumPy an array of
+            64-row words.  The columns are found the first time they are 
+            asked for and kept.
+        """
+        
+        if self.columns == None:
             
-            for state in range(2 ** len(switches)):
+            if self.use_numpy():
                 
-                temp_state = state
+                chunks = []
+                for statement in self.get_statements():
+                    chunks.append([])
                 
-                for input in switches:
-                    x = temp_state % 2 
-                    temp_state //= 2
-                    if x:
-                        input.set(True)
-                    else:
-                        input.set(False)
+                for start , columns in self.get_chunks():
+                    for index in range(len(columns)):
+                        chunks[index].append(columns[index])
                 
-                evaluation = []
+                self.columns = []
+                for chunk in chunks:
+                    self.columns.append(numpy.concatenate(chunk))
+            
+            else:
                 
-                for statement in lights:
-                    
-                    evaluation.append(statement.evaluate())
-                    
-                result = result and (evaluation[0] == evaluation[1])
+                self.columns = self.get_masks()
+        
+        return self.columns
+    
+    def use_numpy(self):
+        """ Returns True if the table is wide enough to be evaluated with the
+            NumPy backend and NumPy is installed.
+        """
+        
+        return numpy != None and len(self.get_internals()) >= NUMPY_INPUTS
+    
+    def get_chunks(self,words = NUMPY_CHUNK):
+        """ Evaluates the statements with NumPy, a block of rows at a time,
+            so that memory stays bounded for very wide tables.  Yields the
+            first state of each block with a list holding every statement's
+            column of the block as packed 64-row words.
+        """
+        
+        internals = self.get_internals()
+        statements = self.get_statements()
+        
+        count = len(internals)
+        total = 2 ** count // 64
+        
+        full = ~numpy.uint64(0)
+        
+        for start in range(0,total,words):
             
-            return result
+            size = min(words,total - start)
             
-        else:
+            columns = packed_columns(count,start,size)
             
-            return None
+            for index in range(count):
+                internals[index].set_mask(columns[index])
+            
+            empty = numpy.zeros(size,numpy.uint64)
+            
+            chunk = []
+            
+            for mask in evaluate_masks(statements,full):
+                chunk.append(mask | empty)
+            
+            yield start * 64 , chunk
+    
+    def set_masks(self,support = None):
+        """ Gives each internal variable its column of the table, so that
+            every statement can be evaluated over all the rows at once.
+            If support, a sorted list of indices of internal variables, is
+            given, the columns are those of a smaller table over just those
+            variables and the other variables are False in every row.
+            Returns the mask of a column with every row set.
+        """
         
-    def compare(self,program):
-        """ Compares the result of a statement to an answer list. """ 
-
-        if len(self.statements) == 1:
+        internals = self.get_internals()
+        
+        if support == None:
+            support = range(len(internals))
+        
+        count = len(support)
+        
+        for input in internals:
+            input.set_mask(0)
+        
+        for index in range(count):
+            internals[support[index]].set_mask(column_mask(index,count))
+        
+        return full_mask(count)
+    
+    def get_masks(self):
+        """ Returns the column of each statement as an integer bitmask.
+            Bit s of a column is the statement's value in state s.  Columns
+            of tables narrower than BDD_INPUTS are kept in the signature 
+            cache under the names of the variables and the statement's 
+            structure hash, found once per node when it was simplified, so
+            a statement with the same structure as one already seen is not
+            evaluated again.  Leaves are hashed by name, so tables whose 
+            variables share a name are not cached.  The columns of the 
+            other statements are expanded to the whole table from their 
+            columns over the rows of their support.
+        """
+        
+        internals = self.get_internals()
+        
+        count = len(internals)
+        
+        names = []
+        for input in internals:
+            names.append(str(input.get_name()))
+        
+        names = tuple(names)
+        
+        cached = count < BDD_INPUTS and len(set(names)) == count
+        
+        keys = []
+        masks = []
+        missing = []
+        
+        for statement in self.get_statements():
             
-            result = True
+            key = ( names , self.memo[( "hash" , id(statement) )] )
             
-            switches = list(self.internals)
-            lights = list(self.statements)
+            mask = None
+            if cached:
+                mask = SIGNATURES.get(key)
             
-            for state in range(2 ** len(switches)):
-                
-                temp_state = state
-                
-                for input in switches:
-                    x = temp_state % 2 
-                    temp_state //= 2
-                    if x:
-                        input.set(True)
-                    else:
-                        input.set(False)
-                
-                evaluation = []
-                
-                statement = lights[0]
-                    
-                evaluation = statement.evaluate()
-                    
-                result = result and (evaluation == program[state])
+            if mask == None:
+                missing.append(len(masks))
             
-            return result
+            keys.append(key)
+            masks.append(mask)
+        
+        if missing:
             
-        else:
+            reduced = self.get_reduced_masks()
+            support = self.get_support()
             
-            return None
+            for index in missing:
+                
+                mask = expand_mask(reduced[index],support,count)
+                
+                masks[index] = mask
+                
+                if cached:
+                    SIGNATURES.put(keys[index],mask)
         
+        return masks
     
-def copy_node(node,var_dic):
-    """ Creates a copy of the node and all of its inputs, replacing 
-        variables using the variable dictionary (var_dic) provided.
-        The dictionary should work like:
-            var_dic[original_Button] = local_table_Variable
-    """
-
-    inputs = node.get_inputs()
-    
-    if inputs == None:
+    def get_reduced_masks(self):
+        """ Returns the column of each statement over just the rows of the
+            support, as integer bitmasks.  These are found along with the
+            support unless it was too wide to check, in which case the 
+            statements are evaluated together in one pass, so nodes they 
+            share are only evaluated once.
+        """
+        
+        support = self.get_support()
         
-        return var_dic[node] 
+        if self.reduced == None:
+            full = self.set_masks(support)
+            self.reduced = evaluate_masks(self.get_statements(),full)
+        
+        return self.reduced
     
-    elif len(inputs) == 1:
-
-        new_input = copy_node(inputs[0],var_dic)
-        new_node = node.Class()(new_input)
+    def set_state(self,state):
+        """ Sets the internal variables to the values they take in a row of
+            the table.  Only the statements' nodes that depend on variables
+            that change are recomputed when they are next asked for values.
+        """
+        
+        for input in self.get_internals():
+            input.set(state % 2 == 1)
+            state //= 2
     
-    elif len(inputs) == 2:
-
-        input_a = copy_node(inputs[0],var_dic)
-        input_b = copy_node(inputs[1],var_dic)
-        new_node = node.Class()(input_a,input_b)
+    def get_row(self,state):
+        """ Returns the value of each statement in a row of the table. """
+        
+        self.set_state(state)
+        
+        return self.get_outputs()
     
-    else:
+    def get_outputs(self):
+        """ Returns the value of each statement for the current values of
+            the internal variables.  The statements are brought up to date
+            together, so nodes they share are only recomputed once.
+        """
+        
+        statements = self.get_statements()
         
-        print "Error: Node type not coded."
-        exit()
+        refresh(statements)
+        
+        row = []
+        
+        for statement in statements:
+            row.append(current_value(statement))
+        
+        return row
     
-    return new_node
-
-
-
-
-
+    def sweep(self):
+        """ Visits every row of the table in Gray-code order, so exactly one
+            variable changes between one row and the next and only the nodes
+            depending on it are recomputed.  Yields the state of each row
+            with the values of the statements in that row.
+        """
+        
+        internals = self.get_internals()
+        
+        self.set_state(0)
+        
+        state = 0
+        
+        for step in range(2 ** len(internals)):
+            
+            if step:
+                index = lowest_row(step)
+                internals[index].toggle()
+                state ^= 1 << index
+            
+            yield state , self.get_outputs()
+    
+    def get_function(self,index):
+        """ Returns the index-th statement compiled into a function of the
+            values of the table's inputs, in order.
+        """
+        
+        return compile_node(self.get_statements()[index],self.get_internals())
+    
+    def get_row_function(self):
+        """ Returns every statement compiled into one function of the values
+            of the table's inputs, in order, returning a tuple of the
+            statements' values.  Sub-expressions shared by the statements
+            are computed once per row.
+        """
+        
+        return compile_statements(self.get_statements(),self.get_internals())
+    
+    def get_value(self):
+        """ Returns the value of the truth table. """
+        
+        return self.evaluate()
+        
+    def get_bdd(self):
+        """ Builds binary decision diagrams of the statements in a single
+            manager.  Returns the manager and the root of each statement's
+            diagram; equivalent statements have the same root.
+        """
+        
+        order = order_variables(self.get_statements(),self.get_internals())
+        
+        manager = BDD(order)
+        
+        memo = {}
+        
+        roots = []
+        
+        for statement in self.get_statements():
+            roots.append(manager.build(statement,memo))
+        
+        return manager , roots
+        
+    def choose_method(self,program = None):
+        """ Chooses how to check the statements of the table against each
+            other, or against an answer list: 'bitmask', 'numpy' or 'bdd'.
+            Statements are only handed to the diagrams if their support is
+            wide.
+        """
+        
+        if program == None and len(self.get_support()) >= BDD_INPUTS:
+            return "bdd"
+        
+        if self.use_numpy():
+            return "numpy"
+        
+        return "bitmask"
+    
+    def get_state(self,assignment):
+        """ Returns the state of the row where the internal variables take
+            the values in the assignment dictionary.  Variables left out of 
+            the assignment are taken to be False.
+        """
+        
+        internals = self.get_internals()
+        
+        state = 0
+        
+        for index in range(len(internals)):
+            if assignment.get(internals[index]):
+                state += 2 ** index
+        
+        return state
+    
+    def miter(self):
+        """ Checks the two statements of the table for equivalence with the
+            SAT solver.  Returns None if they are equivalent, otherwise the
+            state of a row where they differ.
+        """
+        
+        statements = self.get_statements()
+        
+        assignment = miter(statements[0],statements[1],self.get_internals())
+        
+        if assignment == None:
+            return None
+        
+        return self.get_state(assignment)
+    
+    def reduced_mismatch(self):
+        """ Looks for a row where the two statements disagree by comparing
+            their columns over just the rows of their support.  Rows of the
+            whole table that differ only in variables outside the support
+            agree or disagree together, so the first row that disagrees has
+            those variables False.  Returns its state, or None if the statements
+            agree everywhere.
+        """
+        
+        masks = self.get_reduced_masks()
+        
+        state = lowest_row(masks[0] ^ masks[1])
+        
+        if state == None:
+            return None
+        
+        return embed_state(state,self.get_support())
+    
+    def find_mismatch(self,program = None,method = None):
+        """ Looks for a row where the first statement disagrees with the
+            second, or with the answer list program if one is given, and
+            stops as soon as it finds one.  Returns the state of that row,
+            or None if they agree everywhere.  The method may be 'bitmask',
+            'numpy', 'bdd', 'sat', 'gray' or 'parallel'; the diagram and SAT
+            methods can only compare two statements.  By default the method is 
+            chosen from the size of the table.  If the diagrams grow too 
+            large the table is evaluated row by row instead, or for the 
+            widest tables handed to the SAT solver.  Statements that don't
+            depend on every input are compared with bitmasks or NumPy over 
+            just the rows of their support.
+        """
+        
+        count = len(self.get_internals())
+        
+        if method == None or ( program != None and method in ("bdd","sat") ):
+            method = self.choose_method(program)
+        
+        if program == None and method in ("bitmask","numpy"):
+            if len(self.get_support()) < min(count,NUMPY_INPUTS):
+                return self.reduced_mismatch()
+        
+        if method == "bdd":
+            
+            try:
+                
+                manager , roots = self.get_bdd()
+                
+                if roots[0] == roots[1]:
+                    return None
+                
+                first = manager.apply("And",roots[0],manager.negate(roots[1]))
+                second = manager.apply("And",manager.negate(roots[0]),roots[1])
+                
+                differ = manager.apply("Or",first,second)
+                
+                return self.get_state(manager.satisfy(differ))
+            
+            except BDDLimit:
+                
+                if count >= SAT_INPUTS:
+                    method = "sat"
+                else:
+                    method = "numpy"
+        
+        if method == "sat":
+            
+            return self.miter()
+        
+        if method == "parallel":
+            
+            return self.partition(program)
+        
+        if method == "gray":
+            
+            for state , row in self.sweep():
+                
+                if program == None:
+                    expected = row[1]
+                else:
+                    expected = program[state]
+                
+                if row[0] != expected:
+                    return state
+            
+            return None
+        
+        if method == "numpy" and numpy != None and count >= 6:
+            
+            if program != None:
+                answer = pack_words(program)
+            
+            for start , columns in self.get_chunks():
+                
+                if program == None:
+                    expected = columns[1]
+                else:
+                    first = start // 64
+                    expected = answer[first:first + len(columns[0])]
+                
+                words = numpy.flatnonzero(columns[0] != expected)
+                
+                if len(words):
+                    word = int(words[0])
+                    differ = int(columns[0][word] ^ expected[word])
+                    return start + 64 * word + lowest_row(differ)
+            
+            return None
+        
+        masks = self.get_masks()
+        
+        if program == None:
+            expected = masks[1]
+        else:
+            expected = pack_rows(program)
+        
+        return lowest_row(masks[0] ^ expected)
+    
+    def partition(self,program = None,processes = None):
+        """ Looks for a mismatch like find_mismatch, splitting the rows into
+            contiguous blocks that are checked with bitmasks by a pool of
+            worker processes.  The workers are sent the statements as 
+            instructions, and all of them are stopped as soon as a block
+            with a mismatch comes back.  Blocks come back in order, so the
+            first row that disagrees is returned.
+        """
+        
+        internals = self.get_internals()
+        
+        count = len(internals)
+        size = min(count,BLOCK_INPUTS)
+        
+        if program == None:
+            statements = self.get_statements()[:2]
+        else:
+            statements = self.get_statements()[:1]
+        
+        instructions , outputs = flatten(statements,internals)
+        
+        pool = Pool(processes,set_program,(instructions,outputs,count,size))
+        
+        tasks = block_tasks(count,size,program)
+        
+        found = None
+        
+        try:
+            
+            for state in pool.imap(check_block,tasks):
+                
+                if state != None:
+                    found = state
+                    break
+        
+        finally:
+            
+            pool.terminate()
+            pool.join()
+        
+        return found
+    
+    def verify(self,program = None,method = None):
+        """ Checks the first statement against the second, or against the
+            answer list program if one is given, stopping at the first row
+            where they disagree.  Returns None if they agree, otherwise a
+            Counterexample holding that row.  See find_mismatch for the
+            methods.
+        """
+        
+        state = self.find_mismatch(program,method)
+        
+        if state == None:
+            return None
+        
+        row = self.get_row(state)
+        
+        if program == None:
+            values = ( row[0] , row[1] )
+        else:
+            values = ( row[0] , program[state] )
+        
+        internals = self.get_internals()
+        
+        assignment = {}
+        
+        for index in range(len(self.controls)):
+            assignment[self.controls[index]] = internals[index].get_value()
+        
+        return Counterexample(state,assignment,values)
+        
+    def equal(self,method = None):
+        """ Determines if two statements are equal.  See find_mismatch for
+            the methods.
+        """
+        
+        if len(self.originals) == 2:
+            
+            return self.find_mismatch(None,method) == None
+            
+        else:
+            
+            return None
+        
+    def compare(self,program,method = None):
+        """ Compares the result of a statement to an answer list.  See
+            find_mismatch for the methods.
+        """ 
+
+        if len(self.originals) == 1:
+            
+            return self.find_mismatch(program,method) == None
+            
+        else:
+            
+            return None
+        
+
+class Counterexample:
+    """ A row of a truth table where a statement disagrees with another
+        statement or with an answer list.
+    """
+    
+    def __init__(self,state,assignment,values):
+        """ Keeps the state of the row, the dictionary of the table's
+            inputs to their values in the row, and the pair of values that 
+            disagree.
+        """
+        
+        self.state = state
+        self.assignment = assignment
+        self.values = values
+    
+    def __str__(self):
+        """ Returns the row as the input values and the two outputs. """
+        
+        inputs = []
+        
+        for control in self.assignment:
+            inputs.append(str(control.get_name()) + "=" + 
+                          str(self.assignment[control]))
+        
+        inputs.sort()
+        
+        return " ".join(inputs) + " | " + str(self.values[0]) + " " + \
+               str(self.values[1])
+    
+    def get_state(self):
+        """ Returns the state of the row in the truth table. """
+        
+        return self.state
+    
+    def get_assignment(self):
+        """ Returns the dictionary of the table's inputs to their values. """
+        
+        return self.assignment
+    
+    def get_values(self):
+        """ Returns the two values that disagree: the first statement's and
+            the second statement's or the answer's.
+        """
+        
+        return self.values
+        
+    
+def copy_node(node,var_dic,factory = None,copies = None):
+    """ Creates a copy of the node and all of its inputs, replacing 
+        variables using the variable dictionary (var_dic) provided.
+        The dictionary should work like:
+            var_dic[original_Button] = local_table_Variable
+
+        The copy is built with a NodeFactory, so identical sub-expressions
+        become a single shared node.  Passing the same factory when copying
+        several statements shares nodes between them as well.  Constant
+        Value leaves not in the dictionary are kept as constants.
+    """
+    
+    if factory == None:
+        factory = NodeFactory()
+    
+    if copies == None:
+        copies = {}
+    
+    for original in postorder([node],lambda original: id(original) in copies):
+        
+        inputs = original.get_inputs()
+        
+        if inputs == None and original in var_dic:
+            
+            new_node = var_dic[original]
+        
+        elif inputs == None and original.get_type() == "Value":
+            
+            new_node = factory.value(original.get_value())
+        
+        elif inputs == None:
+            
+            return var_dic[original]
+        
+        else:
+            
+            new_inputs = []
+            for input in inputs:
+                new_inputs.append(copies[id(input)])
+            
+            new_node = factory.make(original.Class(),new_inputs)
+        
+        copies[id(original)] = new_node
+    
+    return copies[id(node)]
 
+def simplify(node,factory = None,memo = None):
+    """ Rewrites the expression rooted at node as a smaller equivalent 
+        expression, leaving the original alone.  Constants are folded,
+        double negations removed, and Or and And nodes reduced when their
+        inputs are the same, each other's negation, or absorb each other:
+            x Or x -> x     x Or Not x -> True     x Or ( x And y ) -> x
+        The inputs of Or and And nodes are put in an order that depends
+        only on their structure, and the result is built with a NodeFactory,
+        so trivially different expressions become the same nodes.  The memo
+        dictionary holds the work done so far; passing the same factory and
+        memo when simplifying several statements shares nodes between them.
+    """
+    
+    if factory == None:
+        factory = NodeFactory()
+    
+    if memo == None:
+        memo = {}
+    
+    for original in postorder([node],lambda original: id(original) in memo):
+        
+        inputs = original.get_inputs()
+        kind = original.get_type()
+        
+        if inputs == None and kind == "Value":
+            new_node = factory.value(original.get_value())
+        
+        elif inputs == None:
+            new_node = original
+        
+        elif kind == "Not":
+            new_node = simplify_not(memo[id(inputs[0])],factory)
+        
+        else:
+            a = memo[id(inputs[0])]
+            b = memo[id(inputs[1])]
+            new_node = simplify_pair(kind,a,b,factory,memo)
+        
+        memo[id(original)] = new_node
+        
+        if ( "hash" , id(new_node) ) not in memo:
+            memo[( "hash" , id(new_node) )] = structure_hash(new_node,memo)
+    
+    return memo[id(node)]
+
+def simplify_not(input,factory):
+    """ Returns the simplified negation of a simplified expression. """
+    
+    if input.get_type() == "Value":
+        return factory.value(not input.get_value())
+    
+    if input.get_type() == "Not":
+        return input.get_inputs()[0]
+    
+    return factory.make(Not,[input])
+
+def simplify_pair(kind,a,b,factory,memo):
+    """ Returns the simplified Or or And, by kind, of two simplified 
+        expressions.  The structure hashes of the inputs are kept in memo.
+    """
+    
+    if kind == "Or":
+        Class = Or
+        dual = "And"
+        dominant = True
+    else:
+        Class = And
+        dual = "Or"
+        dominant = False
+    
+    for x , y in ( ( a , b ) , ( b , a ) ):
+        
+        if x.get_type() == "Value" and bool(x.get_value()) == dominant:
+            return factory.value(dominant)
+        
+        if x.get_type() == "Value":
+            return y
+    
+    if a is b:
+        return a
+    
+    for x , y in ( ( a , b ) , ( b , a ) ):
+        
+        if x.get_type() == "Not" and x.get_inputs()[0] is y:
+            return factory.value(dominant)
+        
+        if y.get_type() == dual:
+            for input in y.get_inputs():
+                if input is x:
+                    return x
+    
+    if memo[( "hash" , id(b) )] < memo[( "hash" , id(a) )]:
+        a , b = b , a
+    
+    return factory.make(Class,[a,b])
+
+def structure_hash(node,memo):
+    """ Returns a hash of the structure of a simplified node, given the
+        hashes of its inputs in memo.  The order of the inputs of Or and 
+        And nodes doesn't change the hash, and leaves are told apart by
+        name.
+    """
+    
+    inputs = node.get_inputs()
+    
+    if inputs == None and node.get_type() == "Value":
+        return hash( ( "Value" , bool(node.get_value()) ) )
+    
+    if inputs == None:
+        return hash( ( "Leaf" , str(node.get_name()) ) )
+    
+    hashes = []
+    for input in inputs:
+        hashes.append(memo[( "hash" , id(input) )])
+    
+    hashes.sort()
+    
+    return hash( tuple([node.get_type()] + hashes) )
+
+def postorder(roots,skip = None):
+    """ Returns every node of the expressions rooted at roots, each once,
+        with each node after all of its inputs.  Nodes for which skip
+        returns True are left out, along with inputs only they lead to.
+        The walk keeps its own stack rather than recursing, so expressions
+        thousands of nodes deep are handled in linear time.
+    """
+    
+    order = []
+    seen = set()
+    
+    stack = []
+    for root in reversed(roots):
+        stack.append( ( root , False ) )
+    
+    while stack:
+        
+        node , expanded = stack.pop()
+        
+        if expanded:
+            
+            order.append(node)
+        
+        elif id(node) not in seen:
+            
+            seen.add(id(node))
+            
+            if skip != None and skip(node):
+                continue
+            
+            stack.append( ( node , True ) )
+            
+            inputs = node.get_inputs()
+            
+            if inputs != None:
+                for input in reversed(inputs):
+                    if id(input) not in seen:
+                        stack.append( ( input , False ) )
+    
+    return order
+
+def count_gates(statement):
+    """ Returns the number of gates in a statement: the nodes with inputs,
+        each counted once however many nodes it feeds.
+    """
+    
+    gates = 0
+    
+    for node in postorder([statement]):
+        if node.get_inputs() != None:
+            gates += 1
+    
+    return gates
+
+def flatten(statements,leaves):
+    """ Lists the nodes of the statements as instructions, each after its
+        inputs: ("Variable",index) for the index-th of the leaves, 
+        ("Value",value) for a constant, or the type of the node with the
+        positions of its inputs in the list.  Returns the instructions and
+        the position of each statement.  Unlike the nodes, the instructions
+        can be sent to other processes.
+    """
+    
+    positions = {}
+    for index in range(len(leaves)):
+        positions[id(leaves[index])] = index
+    
+    instructions = []
+    places = {}
+    
+    for node in postorder(statements):
+        
+        inputs = node.get_inputs()
+        
+        if inputs == None and node.get_type() == "Value":
+            instruction = ( "Value" , bool(node.get_value()) )
+        
+        elif inputs == None:
+            instruction = ( "Variable" , positions[id(node)] )
+        
+        else:
+            instruction = [node.get_type()]
+            for input in inputs:
+                instruction.append(places[id(input)])
+            instruction = tuple(instruction)
+        
+        places[id(node)] = len(instructions)
+        instructions.append(instruction)
+    
+    outputs = []
+    for statement in statements:
+        outputs.append(places[id(statement)])
+    
+    return instructions , outputs
+
+def run_instructions(instructions,columns,full):
+    """ Evaluates flattened instructions over a block of rows.  columns
+        holds the mask of each leaf over the block and full the mask with
+        every row of the block set.  Returns the mask of every instruction.
+    """
+    
+    masks = []
+    
+    for instruction in instructions:
+        
+        kind = instruction[0]
+        
+        if kind == "Variable":
+            masks.append(columns[instruction[1]])
+        elif kind == "Value" and instruction[1]:
+            masks.append(full)
+        elif kind == "Value":
+            masks.append(0)
+        elif kind == "Not":
+            masks.append(full ^ masks[instruction[1]])
+        elif kind == "Or":
+            masks.append(masks[instruction[1]] | masks[instruction[2]])
+        elif kind == "And":
+            masks.append(masks[instruction[1]] & masks[instruction[2]])
+        else:
+            print "Error: Node type not coded."
+            exit()
+    
+    return masks
+
+def block_tasks(count,size,program):
+    """ Yields the tasks for checking a table of count variables in blocks
+        of 2^size rows: the number of each block, with its slice of the 
+        answer list if there is one.  The workers pack their own slices,
+        so the parent only copies the answer out once.
+    """
+    
+    rows = 2 ** size
+    
+    for block in range(2 ** ( count - size )):
+        
+        if program == None:
+            yield block , None
+        else:
+            yield block , program[block * rows:( block + 1 ) * rows]
+
+def set_program(instructions,outputs,count,size):
+    """ Keeps the instructions to check in a worker process, along with the
+        columns of the variables that are the same in every block.
+    """
+    
+    global BLOCK_PROGRAM
+    
+    columns = []
+    for index in range(size):
+        columns.append(column_mask(index,size))
+    
+    BLOCK_PROGRAM = ( instructions , outputs , count , size , columns )
+
+def check_block(task):
+    """ Checks one block of rows in a worker process.  Returns the state of
+        the first row of the block where the first statement disagrees
+        with the second or with its slice of the answer, or None.
+    """
+    
+    block , answer = task
+    
+    instructions , outputs , count , size , columns = BLOCK_PROGRAM
+    
+    full = full_mask(size)
+    
+    columns = list(columns)
+    
+    for index in range(size,count):
+        if ( block >> ( index - size ) ) & 1:
+            columns.append(full)
+        else:
+            columns.append(0)
+    
+    masks = run_instructions(instructions,columns,full)
+    
+    if answer == None:
+        answer = masks[outputs[1]]
+    else:
+        answer = pack_rows(answer)
+    
+    row = lowest_row(masks[outputs[0]] ^ answer)
+    
+    if row == None:
+        return None
+    
+    return block * 2 ** size + row
+
+def refresh(roots):
+    """ Brings the values of the expressions rooted at roots up to date in
+        one pass, recomputing only the nodes that are out of date or can't
+        be told of changes.  Nodes shared by several roots are recomputed
+        once.
+    """
+    
+    for node in postorder(roots,is_current):
+        
+        if isinstance(node,Node) and node.get_inputs() != None:
+            
+            node.value = node.compute()
+            
+            node.dirty = False
+
+def evaluate_masks(roots,full,memo = None):
+    """ Evaluates the expressions rooted at roots over every row of a truth
+        table in one pass and returns their masks, as Node.evaluate_mask
+        does for one expression.  Nodes shared by several roots, or already
+        in the memo dictionary, are evaluated once.
+    """
+    
+    if memo == None:
+        memo = {}
+    
+    for node in postorder(roots,lambda node: id(node) in memo):
+        memo[id(node)] = node.column(full,memo)
+    
+    masks = []
+    for root in roots:
+        masks.append(memo[id(root)])
+    
+    return masks
+
+def is_current(node):
+    """ Returns True if the value kept by node is up to date. """
+    
+    return isinstance(node,Node) and not node.dirty and not node.volatile
+
+def current_value(node):
+    """ Returns the value last found for a node, or the value of a leaf
+        that isn't a Node, such as a switch.
+    """
+    
+    if isinstance(node,Node):
+        return node.value
+    
+    return node.get_value()
+
+
+
+
+
+
+# Functions compiled by compile_node, keyed by their arity and generated
+# source.  Only the ones used most recently are kept.
+COMPILED = SignatureCache(COMPILE_CACHE)
+
+# Truth-table signatures of statements, keyed by the names of their variables
+# and their structure hash.
+SIGNATURES = SignatureCache()
+
+# The instructions being checked by a worker process of the 'parallel' 
+# method, set when the process starts.
+BLOCK_PROGRAM = None
+
+def node_structure(node,leaves):
+    """ Writes the expression rooted at node as straight-line Python code
+        over the arguments v0, v1, ... which stand for the leaves, in order.
+        Each operation is given its own temporary, so shared sub-expressions
+        are only written once.  Trees with the same shape over the same
+        leaves produce the same text.
+    """
+    
+    lines , outputs = write_statements([node],leaves)
+    
+    lines.append("return " + outputs[0])
+    
+    return "\n".join(lines)
+
+def statements_structure(statements,leaves):
+    """ Writes several expressions as one piece of straight-line code, as
+        node_structure does for one, returning a tuple of their values.
+        Sub-expressions shared by the expressions are written once.
+    """
+    
+    lines , outputs = write_statements(statements,leaves)
+    
+    lines.append("return (" + ",".join(outputs) + ",)")
+    
+    return "\n".join(lines)
+
+def write_statements(statements,leaves):
+    """ Writes the lines of straight-line code computing the expressions
+        rooted at statements, for node_structure and statements_structure.
+        Returns the lines and the name holding each expression's value.
+    """
+    
+    arguments = {}
+    for index in range(len(leaves)):
+        arguments[leaves[index]] = "v" + str(index)
+    
+    names = {}
+    lines = []
+    
+    for current in postorder(statements):
+        
+        inputs = current.get_inputs()
+        
+        if inputs == None and current.get_type() == "Value":
+            name = str(bool(current.get_value()))
+        
+        elif inputs == None:
+            name = arguments[current]
+            
+        else:
+            terms = []
+            for input in inputs:
+                terms.append(names[id(input)])
+            
+            name = "t" + str(len(lines))
+            
+            if current.get_type() == "Not":
+                lines.append(name + " = not " + terms[0])
+            elif current.get_type() == "Or":
+                lines.append(name + " = " + terms[0] + " or " + terms[1])
+            elif current.get_type() == "And":
+                lines.append(name + " = " + terms[0] + " and " + terms[1])
+            else:
+                print "Error: Node type not coded."
+                exit()
+        
+        names[id(current)] = name
+    
+    outputs = []
+    for statement in statements:
+        outputs.append(names[id(statement)])
+    
+    return lines , outputs
+    
+def compile_node(node,leaves):
+    """ Compiles the expression rooted at node into a Python function that
+        takes the values of the leaves, in order, and returns the value of 
+        the expression.  Functions are cached by the structure of the tree,
+        so every tree of the same shape shares one function.
+    """
+    
+    return compile_body(node_structure(node,leaves),len(leaves))
+
+def compile_statements(statements,leaves):
+    """ Compiles several expressions into one Python function that takes
+        the values of the leaves, in order, and returns a tuple of the 
+        values of the expressions.  Sub-expressions they share are only 
+        computed once per call.
+    """
+    
+    return compile_body(statements_structure(statements,leaves),len(leaves))
+
+def compile_body(body,count):
+    """ Turns straight-line code over count arguments into a function.
+        Functions are cached by their code, so the same code is only
+        compiled once while it stays in use.
+    """
+    
+    key = ( count , body )
+    
+    function = COMPILED.get(key)
+    
+    if function == None:
+        
+        arguments = []
+        for index in range(count):
+            arguments.append("v" + str(index))
+        
+        source = "def compiled(" + ",".join(arguments) + "):\n    "
+        source += body.replace("\n","\n    ") + "\n"
+        
+        namespace = {}
+        exec source in namespace
+        
+        function = namespace["compiled"]
+        
+        COMPILED.put(key,function)
+    
+    return function
+    
+def full_mask(count):
+    """ Returns the mask of a truth table column for count variables with
+        every row set.
+    """
+    
+    return ( 1 << 2 ** count ) - 1
+    
+def column_mask(index,count):
+    """ Returns the column of the index-th of count variables as a bitmask.
+        The variable is off for 2^index rows, on for the next 2^index
+        rows, and so on, matching the order that the rows of a truth table
+        are counted in.
+    """
+    
+    block = 2 ** index
+    
+    mask = ( ( 1 << block ) - 1 ) << block
+    width = 2 * block
+    
+    rows = 2 ** count
+    
+    while width < rows:
+        mask |= mask << width
+        width *= 2
+    
+    return mask
+    
+def depends_on(mask,index,count):
+    """ Returns True if a column over count variables changes with the 
+        index-th variable, by comparing the rows where the variable is off
+        with the rows 2^index later where it is on.
+    """
+    
+    off = full_mask(count) ^ column_mask(index,count)
+    
+    return ( mask & off ) != ( ( mask >> 2 ** index ) & off )
+    
+def swap_variables(mask,first,second,count):
+    """ Returns a column over count variables with the first and second 
+        variables swapped, where first is less than second.  Each row where
+        the first is on and the second off trades places with the row where
+        it is the other way around.
+    """
+    
+    distance = 2 ** second - 2 ** first
+    
+    rows = column_mask(first,count) & ~column_mask(second,count)
+    
+    moved = ( mask ^ ( mask >> distance ) ) & rows
+    
+    return mask ^ moved ^ ( moved << distance )
+    
+def expand_mask(mask,support,count):
+    """ Expands a column over the variables in support, a sorted list of
+        indices of count variables, into a column over all count.  The 
+        column is repeated for the other variables, which are then swapped
+        into place.
+    """
+    
+    order = list(support)
+    
+    for index in range(count):
+        if index not in support:
+            order.append(index)
+    
+    width = 2 ** len(support)
+    
+    while width < 2 ** count:
+        mask |= mask << width
+        width *= 2
+    
+    for index in range(count):
+        
+        current = order.index(index)
+        
+        if current != index:
+            mask = swap_variables(mask,index,current,count)
+            order[index] , order[current] = order[current] , order[index]
+    
+    return mask
+    
+def project_mask(mask,kept,count):
+    """ Projects a column over count variables down to a column over the 
+        variables in kept, a sorted list of indices.  The column must not
+        depend on the other variables; each of them is swapped up to the 
+        top in turn, keeping the order of the rest, and the half of the 
+        column where it is on is dropped.
+    """
+    
+    for index in reversed(range(count)):
+        
+        if index in kept:
+            continue
+        
+        for upper in range(index,count - 1):
+            mask = swap_variables(mask,upper,upper + 1,count)
+        
+        count -= 1
+        mask &= full_mask(count)
+    
+    return mask
+    
+def embed_state(state,support):
+    """ Returns the state of the whole table matching a state of a table
+        over just the variables in support, with the other variables False.
+    """
+    
+    out = 0
+    
+    for index in range(len(support)):
+        if ( state >> index ) & 1:
+            out |= 1 << support[index]
+    
+    return out
+    
+def lowest_row(mask):
+    """ Returns the first state set in a bitmask, or None if the mask is
+        empty.
+    """
+    
+    if not mask:
+        return None
+    
+    return ( mask & -mask ).bit_length() - 1
+    
+def pack_rows(rows):
+    """ Packs a list of truth values, one per state, into a bitmask.  The
+        bits are joined as a string and parsed in one go, since setting 
+        them one at a time copies the growing mask for every row.
+    """
+    
+    if not rows:
+        return 0
+    
+    bits = []
+    for row in reversed(rows):
+        bits.append("1" if row else "0")
+    
+    return int("".join(bits),2)
+    
+def unpack_mask(mask,rows):
+    """ Unpacks the first rows bits of a bitmask into a list of truth 
+        values, one per state, from its binary string rather than shifting
+        the whole mask for every row.
+    """
+    
+    bits = format(mask,"0%db" % rows)[::-1]
+    
+    out = []
+    
+    for state in range(rows):
+        out.append(bits[state] == "1")
+    
+    return out
+
+def packed_columns(count,start,words):
+    """ Returns the columns of count variables for a block of a truth table
+        as NumPy arrays of 64-row words, starting at word start.  Needs at
+        least six variables so that a word is filled.
+    """
+    
+    columns = []
+    
+    for index in range(6):
+        pattern = numpy.uint64(column_mask(index,6))
+        columns.append(numpy.full(words,pattern,numpy.uint64))
+    
+    position = numpy.arange(start,start + words,dtype = numpy.uint64)
+    
+    for index in range(6,count):
+        bits = ( position >> numpy.uint64(index - 6) ) & numpy.uint64(1)
+        columns.append(numpy.uint64(0) - bits)
+    
+    return columns
+    
+def unpack_words(words):
+    """ Unpacks an array of 64-row words into a boolean array. """
+    
+    shifts = numpy.arange(64,dtype = numpy.uint64)
+    
+    bits = ( words[:,None] >> shifts ) & numpy.uint64(1)
+    
+    return bits.astype(bool).ravel()
+    
+def pack_words(rows):
+    """ Packs a list of truth values, one per state, into an array of 
+        64-row words.
+    """
+    
+    shifts = numpy.arange(64,dtype = numpy.uint64)
+    
+    bits = numpy.asarray(rows,bool).astype(numpy.uint64).reshape(-1,64)
+    
+    return numpy.bitwise_or.reduce(bits << shifts,axis = 1)
+    
 def create_truth_table(buttons,number):
     
     out = []
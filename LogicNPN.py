@@ -0,0 +1,189 @@
+#
+# NPN classes of puzzles for Logic Lights
+#
+# Two puzzles are in the same NPN class when one becomes the other by
+# permuting the switches, negating some of the switches and possibly
+# negating the light.  Puzzles are truth-table numbers, bit s being the
+# light's value in state s, as made by create_truth_table.
+#
+
+from array import array
+from itertools import permutations
+
+from LogicLogic import full_mask
+
+# Classes are looked up in a table for up to this many switches, and found
+# by trying every transform for more.
+NPN_INPUTS = 4
+
+# Lookup tables built so far, by number of switches.
+TABLES = {}
+
+def get_transforms(count):
+    """ Returns every transform of a puzzle for count switches, as tuples
+        of a permutation of the switches, a bitmask of the switches to
+        negate and whether to negate the light.
+    """
+    
+    transforms = []
+    
+    for permutation in permutations(range(count)):
+        for flips in range(2 ** count):
+            for negate in ( False , True ):
+                transforms.append( ( permutation , flips , negate ) )
+    
+    return transforms
+
+def get_rows(transform,count):
+    """ Returns, for each state, the state of the original puzzle that a
+        transform reads it from.
+    """
+    
+    permutation , flips , negate = transform
+    
+    rows = []
+    
+    for state in range(2 ** count):
+        
+        row = 0
+        for index in range(count):
+            if ( state >> permutation[index] ) & 1:
+                row |= 1 << index
+        
+        rows.append(row ^ flips)
+    
+    return rows
+
+def apply_rows(puzzle,rows,negate,full):
+    """ Applies a transform, given by its rows and negation, to a puzzle. """
+    
+    out = 0
+    
+    for state in range(len(rows)):
+        if ( puzzle >> rows[state] ) & 1:
+            out |= 1 << state
+    
+    if negate:
+        out ^= full
+    
+    return out
+
+def transform_puzzle(puzzle,count,transform):
+    """ Returns the puzzle that a transform turns puzzle into.  In state s
+        of the new puzzle, switch i of the old puzzle takes the value of
+        switch permutation[i], negated if bit i of flips is set.
+    """
+    
+    rows = get_rows(transform,count)
+    
+    return apply_rows(puzzle,rows,transform[2],full_mask(count))
+
+def invert_transform(transform):
+    """ Returns the transform that undoes the given one. """
+    
+    permutation , flips , negate = transform
+    
+    inverse = [0] * len(permutation)
+    inverse_flips = 0
+    
+    for index in range(len(permutation)):
+        inverse[permutation[index]] = index
+        if ( flips >> index ) & 1:
+            inverse_flips |= 1 << permutation[index]
+    
+    return ( tuple(inverse) , inverse_flips , negate )
+
+def build_table(count):
+    """ Builds the lookup table for count switches.  Puzzles are visited
+        in increasing order, so the first puzzle of each class to be met
+        is its smallest, which is used as the class's canonical form.
+        Every puzzle of its class is found by applying each transform to
+        it.  Returns arrays of the canonical form of each puzzle and the
+        index of a transform taking it there.
+    """
+    
+    full = full_mask(count)
+    
+    transforms = get_transforms(count)
+    
+    rows = []
+    for transform in transforms:
+        rows.append(get_rows(transform,count))
+    
+    inverses = []
+    for transform in transforms:
+        inverses.append(transforms.index(invert_transform(transform)))
+    
+    canonical = array("H",[0] * ( full + 1 ))
+    chosen = array("H",[0] * ( full + 1 ))
+    found = array("B",[0] * ( full + 1 ))
+    
+    for puzzle in range(full + 1):
+        
+        if found[puzzle]:
+            continue
+        
+        for index in range(len(transforms)):
+            
+            member = apply_rows(puzzle,rows[index],transforms[index][2],full)
+            
+            if not found[member]:
+                found[member] = 1
+                canonical[member] = puzzle
+                chosen[member] = inverses[index]
+    
+    return canonical , chosen , transforms
+
+def get_table(count):
+    """ Returns the lookup table for count switches, building it the first
+        time it is asked for.
+    """
+    
+    if count not in TABLES:
+        TABLES[count] = build_table(count)
+    
+    return TABLES[count]
+
+def canonical_transform(puzzle,count):
+    """ Returns the canonical form of a puzzle's NPN class, the smallest
+        puzzle in the class, and a transform taking the puzzle to it.
+    """
+    
+    if count <= NPN_INPUTS:
+        
+        canonical , chosen , transforms = get_table(count)
+        
+        return canonical[puzzle] , transforms[chosen[puzzle]]
+    
+    best = None
+    best_transform = None
+    
+    for transform in get_transforms(count):
+        
+        member = transform_puzzle(puzzle,count,transform)
+        
+        if best == None or member < best:
+            best = member
+            best_transform = transform
+    
+    return best , best_transform
+
+def canonical_form(puzzle,count):
+    """ Returns the canonical form of a puzzle's NPN class.  Puzzles in
+        the same class have the same canonical form, so it can be used
+        to key anything that only depends on the class.
+    """
+    
+    return canonical_transform(puzzle,count)[0]
+
+def get_classes(count):
+    """ Returns a dictionary from the canonical form of each NPN class for
+        count switches to the list of puzzles in the class.
+    """
+    
+    classes = {}
+    
+    for puzzle in range(full_mask(count) + 1):
+        classes.setdefault(canonical_form(puzzle,count),[]).append(puzzle)
+    
+    return classes
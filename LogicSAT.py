@@ -0,0 +1,501 @@
+#
+# Satisfiability checking for Logic Lights
+#
+
+# Variable activities decay by this factor after every conflict.
+DECAY = 0.95
+
+# The solver restarts after this many conflicts, growing by RESTART_GROWTH
+# after every restart.
+RESTART = 100
+RESTART_GROWTH = 1.5
+
+class Solver:
+    """ A conflict-driven clause-learning SAT solver.  Variables are
+        numbered from 1 and literals are signed variable numbers, negative
+        literals standing for a negated variable.  Clauses are watched by
+        their first two literals, conflicts are analysed back to the first
+        unique implication point to learn a new clause, and decisions follow
+        the activity of the variables in recent conflicts.
+    """
+    
+    def __init__(self):
+        """ Creates a solver with no variables or clauses. """
+        
+        self.count = 0
+        
+        self.clauses = []
+        self.watches = {}
+        
+        self.values = [None]
+        self.levels = [0]
+        self.reasons = [None]
+        self.activity = [0.0]
+        self.phases = [False]
+        
+        self.trail = []
+        self.limits = []
+        self.head = 0
+        
+        self.increment = 1.0
+        
+        self.contradiction = False
+        
+        self.model = None
+    
+    def new_variable(self):
+        """ Adds a variable to the solver and returns its number. """
+        
+        self.count += 1
+        
+        self.values.append(None)
+        self.levels.append(0)
+        self.reasons.append(None)
+        self.activity.append(0.0)
+        self.phases.append(False)
+        
+        self.watches[self.count] = []
+        self.watches[-self.count] = []
+        
+        return self.count
+    
+    def value(self,literal):
+        """ Returns the truth value of a literal, or None if its variable
+            has not been assigned.
+        """
+        
+        value = self.values[abs(literal)]
+        
+        if value == None:
+            return None
+        
+        return value == ( literal > 0 )
+    
+    def get_level(self):
+        """ Returns the current decision level. """
+        
+        return len(self.limits)
+    
+    def assign(self,literal,reason):
+        """ Makes a literal True, recording the clause that implied it. """
+        
+        variable = abs(literal)
+        
+        self.values[variable] = literal > 0
+        self.levels[variable] = self.get_level()
+        self.reasons[variable] = reason
+        
+        self.trail.append(literal)
+    
+    def attach(self,clause):
+        """ Stores a clause of at least two literals, watching the first
+            two.  Returns the index of the clause.
+        """
+        
+        index = len(self.clauses)
+        
+        self.clauses.append(clause)
+        
+        self.watches[clause[0]].append(index)
+        self.watches[clause[1]].append(index)
+        
+        return index
+    
+    def add_clause(self,literals):
+        """ Adds a clause to the problem.  Returns False if the problem is
+            now known to be unsatisfiable.
+        """
+        
+        if self.contradiction:
+            return False
+        
+        self.backtrack(0)
+        
+        clause = []
+        
+        for literal in literals:
+            
+            value = self.value(literal)
+            
+            if value == True or -literal in clause:
+                return True
+            
+            if value == None and literal not in clause:
+                clause.append(literal)
+        
+        if not clause:
+            
+            self.contradiction = True
+        
+        elif len(clause) == 1:
+            
+            self.assign(clause[0],None)
+            
+            if self.propagate() != None:
+                self.contradiction = True
+        
+        else:
+            
+            self.attach(clause)
+        
+        return not self.contradiction
+    
+    def propagate(self):
+        """ Assigns every literal implied by the current assignment.
+            Returns the index of a clause that has become False, or None if
+            there is no conflict.
+        """
+        
+        while self.head < len(self.trail):
+            
+            false = -self.trail[self.head]
+            self.head += 1
+            
+            watching = self.watches[false]
+            kept = []
+            
+            conflict = None
+            
+            i = 0
+            while i < len(watching):
+                
+                index = watching[i]
+                i += 1
+                
+                clause = self.clauses[index]
+                
+                if clause[0] == false:
+                    clause[0] , clause[1] = clause[1] , clause[0]
+                
+                if self.value(clause[0]) == True:
+                    kept.append(index)
+                    continue
+                
+                moved = False
+                
+                for k in range(2,len(clause)):
+                    if self.value(clause[k]) != False:
+                        clause[1] , clause[k] = clause[k] , clause[1]
+                        self.watches[clause[1]].append(index)
+                        moved = True
+                        break
+                
+                if moved:
+                    continue
+                
+                kept.append(index)
+                
+                if self.value(clause[0]) == False:
+                    conflict = index
+                    kept += watching[i:]
+                    break
+                
+                self.assign(clause[0],index)
+            
+            self.watches[false] = kept
+            
+            if conflict != None:
+                return conflict
+        
+        return None
+    
+    def bump(self,variable):
+        """ Raises the activity of a variable involved in a conflict. """
+        
+        self.activity[variable] += self.increment
+        
+        if self.activity[variable] > 1e100:
+            for other in range(1,self.count + 1):
+                self.activity[other] *= 1e-100
+            self.increment *= 1e-100
+    
+    def analyze(self,conflict):
+        """ Works back from a conflicting clause to the first unique
+            implication point.  Returns the learnt clause, whose first
+            literal is the one it asserts, and the level to go back to.
+        """
+        
+        learnt = [None]
+        seen = set()
+        
+        level = self.get_level()
+        counter = 0
+        
+        literal = None
+        clause = self.clauses[conflict]
+        index = len(self.trail) - 1
+        
+        while True:
+            
+            if literal == None:
+                start = 0
+            else:
+                start = 1
+            
+            for other in clause[start:]:
+                
+                variable = abs(other)
+                
+                if variable not in seen and self.levels[variable] > 0:
+                    
+                    seen.add(variable)
+                    self.bump(variable)
+                    
+                    if self.levels[variable] == level:
+                        counter += 1
+                    else:
+                        learnt.append(other)
+            
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            
+            literal = self.trail[index]
+            index -= 1
+            
+            counter -= 1
+            
+            if counter == 0:
+                break
+            
+            clause = self.clauses[self.reasons[abs(literal)]]
+        
+        learnt[0] = -literal
+        
+        if len(learnt) == 1:
+            return learnt , 0
+        
+        best = 1
+        for k in range(2,len(learnt)):
+            if self.levels[abs(learnt[k])] > self.levels[abs(learnt[best])]:
+                best = k
+        
+        learnt[1] , learnt[best] = learnt[best] , learnt[1]
+        
+        return learnt , self.levels[abs(learnt[1])]
+    
+    def backtrack(self,level):
+        """ Undoes every assignment made above the given decision level. """
+        
+        if self.get_level() > level:
+            
+            start = self.limits[level]
+            
+            for literal in self.trail[start:]:
+                variable = abs(literal)
+                self.phases[variable] = self.values[variable]
+                self.values[variable] = None
+                self.reasons[variable] = None
+            
+            del self.trail[start:]
+            del self.limits[level:]
+            
+            self.head = len(self.trail)
+    
+    def decide(self):
+        """ Returns the literal to try next: the unassigned variable with
+            the highest activity, in the phase it last had.  Returns None
+            when every variable is assigned.
+        """
+        
+        best = None
+        
+        for variable in range(1,self.count + 1):
+            if self.values[variable] == None:
+                if best == None or self.activity[variable] > self.activity[best]:
+                    best = variable
+        
+        if best == None:
+            return None
+        
+        if self.phases[best]:
+            return best
+        
+        return -best
+    
+    def solve(self):
+        """ Searches for an assignment that satisfies every clause.  Returns
+            True and keeps the assignment in self.model if there is one,
+            or False if the clauses cannot be satisfied.
+        """
+        
+        self.model = None
+        
+        if self.contradiction:
+            return False
+        
+        self.backtrack(0)
+        
+        conflicts = 0
+        restart = RESTART
+        
+        while True:
+            
+            conflict = self.propagate()
+            
+            if conflict != None:
+                
+                if self.get_level() == 0:
+                    self.contradiction = True
+                    return False
+                
+                learnt , level = self.analyze(conflict)
+                
+                self.backtrack(level)
+                
+                if len(learnt) == 1:
+                    self.assign(learnt[0],None)
+                else:
+                    self.assign(learnt[0],self.attach(learnt))
+                
+                self.increment /= DECAY
+                
+                conflicts += 1
+                
+                if conflicts >= restart:
+                    conflicts = 0
+                    restart = int(restart * RESTART_GROWTH)
+                    self.backtrack(0)
+            
+            else:
+                
+                literal = self.decide()
+                
+                if literal == None:
+                    self.model = list(self.values)
+                    return True
+                
+                self.limits.append(len(self.trail))
+                self.assign(literal,None)
+    
+    def get_model(self,literal):
+        """ Returns the value of a literal in the satisfying assignment. """
+        
+        return self.model[abs(literal)] == ( literal > 0 )
+
+
+class Encoder:
+    """ Turns Not/Or/And expressions into clauses with the Tseitin
+        encoding: every Or and And node gets a solver variable constrained
+        to equal its output.  Not nodes are free, simply negating the
+        literal of their input.
+    """
+    
+    def __init__(self,solver):
+        """ Creates an encoder adding its clauses to solver. """
+        
+        self.solver = solver
+        
+        self.leaves = {}
+        self.literals = {}
+        
+        self.true = None
+    
+    def leaf(self,node):
+        """ Returns the literal standing for a leaf of the expressions. """
+        
+        if node not in self.leaves:
+            self.leaves[node] = self.solver.new_variable()
+        
+        return self.leaves[node]
+    
+    def constant(self,value):
+        """ Returns a literal with a fixed truth value. """
+        
+        if self.true == None:
+            self.true = self.solver.new_variable()
+            self.solver.add_clause([self.true])
+        
+        if value:
+            return self.true
+        
+        return -self.true
+    
+    def encode(self,node):
+        """ Returns the literal equal to the output of node, adding the
+            clauses that define it.  Shared nodes are only encoded once.
+            Inputs are encoded before the nodes using them by walking an
+            explicit stack, so deep expressions don't recurse.
+        """
+        
+        stack = [ ( node , False ) ]
+        
+        while stack:
+            
+            current , expanded = stack.pop()
+            
+            if id(current) in self.literals:
+                continue
+            
+            inputs = current.get_inputs()
+            
+            if inputs != None and not expanded:
+                
+                stack.append( ( current , True ) )
+                
+                for input in reversed(inputs):
+                    if id(input) not in self.literals:
+                        stack.append( ( input , False ) )
+                
+                continue
+            
+            if inputs == None and current.get_type() == "Value":
+                
+                literal = self.constant(current.get_value())
+            
+            elif inputs == None:
+                
+                literal = self.leaf(current)
+            
+            elif current.get_type() == "Not":
+                
+                literal = -self.literals[id(inputs[0])]
+            
+            else:
+                
+                a = self.literals[id(inputs[0])]
+                b = self.literals[id(inputs[1])]
+                
+                literal = self.solver.new_variable()
+                
+                if current.get_type() == "Or":
+                    self.solver.add_clause([-literal,a,b])
+                    self.solver.add_clause([literal,-a])
+                    self.solver.add_clause([literal,-b])
+                else:
+                    self.solver.add_clause([literal,-a,-b])
+                    self.solver.add_clause([-literal,a])
+                    self.solver.add_clause([-literal,b])
+            
+            self.literals[id(current)] = literal
+        
+        return self.literals[id(node)]
+
+
+def miter(statement_a,statement_b,variables):
+    """ Checks two expressions over the same leaves for equivalence by
+        asking the solver for an input where their outputs differ.  Returns
+        None if the expressions are equivalent, otherwise a dictionary from
+        each of the variables to its value in a counterexample.
+    """
+    
+    solver = Solver()
+    encoder = Encoder(solver)
+    
+    for variable in variables:
+        encoder.leaf(variable)
+    
+    a = encoder.encode(statement_a)
+    b = encoder.encode(statement_b)
+    
+    solver.add_clause([a,b])
+    solver.add_clause([-a,-b])
+    
+    if not solver.solve():
+        return None
+    
+    assignment = {}
+    
+    for variable in variables:
+        assignment[variable] = solver.get_model(encoder.leaf(variable))
+    
+    return assignment